@@ -0,0 +1,393 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# google-genai (and httpx under it) is imported where it's needed, so
+# importing this module doesn't pay for it before the first Gemini call
+
+# --- Configuration ---
+# Token bucket sized to the Gemini quota: GEMINI_RPM requests per minute on
+# average, with bursts of up to GEMINI_BURST. A call waits at most
+# GEMINI_RATE_WAIT seconds for a token before giving up.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_RATE_WAIT = float(os.getenv("GEMINI_RATE_WAIT", "60"))
+
+# Retries of rate-limited (429), server (5xx) and network errors, with full
+# jitter exponential backoff: sleep uniform(0, min(MAX, BASE * 2**attempt))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Circuit breaker: after this many consecutive failed calls (retries
+# exhausted), calls fail immediately for GEMINI_BREAKER_RESET seconds; then
+# one trial call decides whether to close it again.
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+
+class AIUnavailableError(Exception):
+    """The Gemini API can't be called right now (circuit open or rate limit wait exceeded)"""
+
+# --- Rate Limiting ---
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Take one token, waiting for it if needed.
+
+        Returns:
+            bool: False if no token became available within `timeout` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+# --- Circuit Breaker ---
+class CircuitBreaker:
+    """
+    Fails fast once the API looks down.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: calls are refused until `reset_timeout` has passed.
+    half-open: a single trial call is let through; success closes the
+    breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        """
+        Raise AIUnavailableError unless a call may be made now. Called once
+        per call (not per retry attempt).
+
+        Returns:
+            bool: True if this call is the half-open trial; the caller must
+            then end it with record_success, record_failure or end_trial
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise AIUnavailableError(f"Gemini API unavailable; retrying in {remaining:.0f}s")
+            if self.trial_running:
+                raise AIUnavailableError("Gemini API unavailable; a trial call is in progress")
+            self.trial_running = True
+            return True
+
+    def end_trial(self):
+        """Let another trial through after one ended without an answer (e.g. rate limit wait)"""
+        with self.lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                print("[AI] Circuit closed: Gemini API is responding again.")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self, trial=False):
+        with self.lock:
+            self.failures += 1
+            if trial:
+                self.trial_running = False
+            if trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                print(f"[AI] Circuit open after {self.failures} consecutive failure(s).")
+
+# --- Retry Policy ---
+def is_retryable(error):
+    """Rate limits, server errors and network errors are worth retrying; bad requests are not"""
+    import httpx
+    from google.genai import errors as genai_errors
+
+    if isinstance(error, genai_errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+def _retry_after(error):
+    """Server-suggested delay of a 429 (google.rpc.RetryInfo), in seconds, or None"""
+    details = getattr(error, 'details', None)
+    if not isinstance(details, dict):
+        return None
+    for detail in details.get('error', {}).get('details', []) or []:
+        if isinstance(detail, dict) and str(detail.get('@type', '')).endswith('RetryInfo'):
+            match = re.match(r'^([\d.]+)s$', str(detail.get('retryDelay', '')))
+            if match:
+                return float(match.group(1))
+    return None
+
+def backoff_delay(attempt, error=None):
+    """Full-jitter exponential backoff for the given (0-based) retry attempt"""
+    delay = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+    suggested = _retry_after(error) if error is not None else None
+    if suggested is not None:
+        delay = max(delay, min(suggested, GEMINI_BACKOFF_MAX))
+    return delay
+
+# --- Resilient Client ---
+class ResilientClient:
+    """
+    Drop-in wrapper around a genai.Client (or FakeClient) exposing the same
+    `models.generate_content`, `models.generate_content_stream`,
+    `files.upload` and `files.delete` calls.
+
+    Every model call takes a token from the shared rate limiter. All calls
+    are retried on retryable errors and go through the circuit breaker.
+    A stream is only retried if it failed before producing any text; after
+    that the caller has already seen part of the response.
+    """
+
+    def __init__(self, client, limiter=None, breaker=None, max_retries=GEMINI_MAX_RETRIES):
+        self.client = client
+        self.limiter = limiter or TokenBucket(GEMINI_RPM / 60.0, GEMINI_BURST)
+        self.breaker = breaker or CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET)
+        self.max_retries = max_retries
+        self.models = SimpleNamespace(
+            generate_content=self._generate_content,
+            generate_content_stream=self._generate_content_stream
+        )
+        self.files = SimpleNamespace(upload=self._upload, delete=self._delete)
+
+    def _take_token(self):
+        if not self.limiter.acquire(timeout=GEMINI_RATE_WAIT):
+            raise AIUnavailableError(f"Gemini rate limit: no request slot within {GEMINI_RATE_WAIT:.0f}s")
+
+    def _call(self, name, func, rate_limited=True):
+        """Run func() with circuit breaker, rate limiting and retries"""
+        trial = self.breaker.allow()
+        attempt = 0
+        try:
+            while True:
+                if rate_limited:
+                    self._take_token()
+                try:
+                    result = func()
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The API answered; the request itself was at fault
+                        self.breaker.record_success()
+                        raise
+                    if attempt >= self.max_retries:
+                        self.breaker.record_failure(trial)
+                        raise
+                    delay = backoff_delay(attempt, e)
+                    print(f"[AI] {name} failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                return result
+        finally:
+            if trial:
+                self.breaker.end_trial()
+
+    def _generate_content(self, **kwargs):
+        return self._call('generate_content', lambda: self.client.models.generate_content(**kwargs))
+
+    def _generate_content_stream(self, **kwargs):
+        trial = self.breaker.allow()
+        attempt = 0
+        try:
+            while True:
+                self._take_token()
+                started = False
+                try:
+                    for chunk in self.client.models.generate_content_stream(**kwargs):
+                        started = True
+                        yield chunk
+                except GeneratorExit:
+                    # The caller stopped reading; the API itself was answering
+                    self.breaker.record_success()
+                    raise
+                except Exception as e:
+                    if not is_retryable(e):
+                        self.breaker.record_success()
+                        raise
+                    if started or attempt >= self.max_retries:
+                        self.breaker.record_failure(trial)
+                        raise
+                    delay = backoff_delay(attempt, e)
+                    print(f"[AI] generate_content_stream failed ({e}); retry {attempt + 1}/{self.max_retries} "
+                          f"in {delay:.1f}s")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                return
+        finally:
+            if trial:
+                self.breaker.end_trial()
+
+    def _upload(self, **kwargs):
+        return self._call('files.upload', lambda: self.client.files.upload(**kwargs), rate_limited=False)
+
+    def _delete(self, **kwargs):
+        return self._call('files.delete', lambda: self.client.files.delete(**kwargs), rate_limited=False)
+
+# --- Fake Client ---
+_FAKE_SCHEDULE = {
+    "meetings": [{"title": "Lecture", "days": ["MO", "WE"], "start_time": "10:00", "end_time": "11:15",
+                  "location": "Room 101"}],
+    "office_hours": [{"days": ["TU"], "start_time": "14:00", "end_time": "15:00"}],
+    "deadlines": [{"title": "Midterm Exam", "week": 8, "weekday": "WE", "time": "10:00"},
+                  {"title": "Final Project", "week": 15, "weekday": "FR"}]
+}
+
+class FakeClient:
+    """
+    Offline stand-in for genai.Client with canned answers, for load tests
+    and benchmarks.
+
+    A call waits `latency` (time to first token, +/- 50%), then produces its
+    output at `tokens_per_second`; streamed responses arrive in pieces at
+    that pace. Token counts are estimated at 4 characters per token (files
+    by size) and reported in usage_metadata like the real API.
+
+    Args:
+        latency (float): Seconds before the first token
+        error_rate (float): Fraction of calls failing with a retryable error
+        error_code (int): HTTP status of those failures (429 or 503)
+        tokens_per_second (float): Output rate; 0 means instantaneous
+        upload_latency (float): Seconds each file upload takes
+    """
+
+    def __init__(self, latency=0.5, error_rate=0.0, error_code=429, tokens_per_second=0.0, upload_latency=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.tokens_per_second = tokens_per_second
+        self.upload_latency = upload_latency
+        self.calls = 0
+        self.lock = threading.Lock()
+        self._files = 0
+        self.models = SimpleNamespace(
+            generate_content=self._generate_content,
+            generate_content_stream=self._generate_content_stream
+        )
+        self.files = SimpleNamespace(upload=self._upload, delete=lambda **kwargs: None)
+
+    def _maybe_fail(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.error_rate:
+            from google.genai import errors as genai_errors
+            status = 'RESOURCE_EXHAUSTED' if self.error_code == 429 else 'UNAVAILABLE'
+            error = genai_errors.ClientError if self.error_code < 500 else genai_errors.ServerError
+            raise error(self.error_code, {'error': {'code': self.error_code, 'message': 'Fake failure',
+                                                    'status': status}})
+
+    def _answer(self, contents, config):
+        if isinstance(config, dict) and config.get('response_mime_type') == 'application/json':
+            return json.dumps(_FAKE_SCHEDULE)
+        prompt = contents[0] if contents and isinstance(contents[0], str) else ''
+        if 'Is this a course syllabus' in prompt:
+            return 'yes'
+        if 'list of' in prompt:
+            return ("- Course textbook: *Introduction to Algorithms* (Cormen et al.)\n"
+                    "- [MIT OpenCourseWare](https://ocw.mit.edu)\n")
+        return "This course covers the fundamentals of the subject, with weekly lectures, homework and two exams."
+
+    @staticmethod
+    def _tokens(text):
+        return max(1, len(text) // 4)
+
+    def _usage(self, contents, text):
+        prompt_tokens = 0
+        for part in contents or []:
+            if isinstance(part, str):
+                prompt_tokens += self._tokens(part)
+            else:
+                prompt_tokens += getattr(part, 'size_bytes', 0) // 4
+        return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=self._tokens(text))
+
+    def _generation_time(self, text):
+        return self._tokens(text) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate_content(self, model=None, contents=None, config=None, **kwargs):
+        self._maybe_fail()
+        text = self._answer(contents, config)
+        time.sleep(self._generation_time(text))
+        return SimpleNamespace(text=text, usage_metadata=self._usage(contents, text))
+
+    def _generate_content_stream(self, model=None, contents=None, config=None, **kwargs):
+        self._maybe_fail()
+        text = self._answer(contents, config)
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+        for i, piece in enumerate(pieces):
+            time.sleep(self._generation_time(piece))
+            last = i == len(pieces) - 1
+            yield SimpleNamespace(text=piece, usage_metadata=self._usage(contents, text) if last else None)
+
+    def _upload(self, file=None, **kwargs):
+        time.sleep(self.upload_latency)
+        with self.lock:
+            self._files += 1
+            name = f"files/fake-{self._files}"
+        size = os.path.getsize(file) if isinstance(file, str) and os.path.exists(file) else 0
+        return SimpleNamespace(name=name, uri=f"fake://{name}", size_bytes=size)
+
+def create_client(api_key=None, backend=None):
+    """
+    Create the Gemini client used by the app, wrapped in ResilientClient.
+
+    Args:
+        api_key (str, optional): Gemini API key
+        backend (str, optional): 'gemini' (default) or 'fake' for the offline
+                                 FakeClient (AI_BACKEND environment variable)
+    """
+    backend = backend or os.getenv("AI_BACKEND", "gemini")
+    if backend == "fake":
+        print("[AI] Using the offline fake client.")
+        return ResilientClient(FakeClient(
+            latency=float(os.getenv("FAKE_AI_LATENCY", "0.5")),
+            error_rate=float(os.getenv("FAKE_AI_ERROR_RATE", "0")),
+            error_code=int(os.getenv("FAKE_AI_ERROR_CODE", "429")),
+            tokens_per_second=float(os.getenv("FAKE_AI_TOKENS_PER_SECOND", "0")),
+            upload_latency=float(os.getenv("FAKE_AI_UPLOAD_LATENCY", "0"))
+        ))
+    if backend != "gemini":
+        raise ValueError(f"Unknown AI_BACKEND: {backend}")
+    from google import genai
+    return ResilientClient(genai.Client(api_key=api_key))
@@ -1,122 +1,206 @@
 import os
-from datetime import datetime
-import markdown
-from werkzeug.utils import secure_filename
-from flask import Flask, flash, redirect, render_template, request, session, g
-from flask_session import Session
+import hmac
+import sqlite3
+import time
+from datetime import datetime, timezone
+import click
+from flask import (
+    Blueprint, Flask, Response, current_app, flash, jsonify, redirect, render_template, request, session, g, stream_with_context,
+    url_for
+)
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.http import is_resource_modified
 from werkzeug.security import check_password_hash, generate_password_hash
 from markupsafe import Markup
 
 from helpers import (
-    login_required, allowed_file, ai_analyze_file, ai_validate_syllabus, 
-    ai_generate_resources, ai_generate_ics, UPLOAD_FOLDER, get_db, query_db, execute_db, 
-    init_db, add_syllabus_result, get_user_results
+    login_required, allowed_file, is_archive, extract_upload_archive, UPLOAD_FOLDER,
+    MAX_BATCH_FILES, MAX_BATCH_UPLOAD_BYTES, UploadRequest, get_db, release_db, query_db, execute_db,
+    init_db, get_user_results, get_latest_semester_dates, get_result_for_view, invalidate_cache,
+    rebuild_calendars, get_calendar_token, get_calendar_feed_user, calendar_feed_version,
+    get_calendar_feed, compress_legacy_results, unpack_result_field, index_unindexed_results, search_results,
+    transaction
 )
+import metrics
+from jobs import enqueue_batch, enqueue_job, get_batch, get_job, start_workers, stream_job_events
+from sessions import init_sessions
 
-# Initialize database if it doesn't exist
-init_db()
+# All routes, hooks and CLI commands live on this blueprint; create_app()
+# builds the application around it
+bp = Blueprint("main", __name__, cli_group=None)
 
-app = Flask(__name__)
+# Metrics: scraped from /metrics (Prometheus text format) with
+# "Authorization: Bearer <METRICS_TOKEN>". Without a token the endpoint
+# doesn't exist (404), so it is never public by accident.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
-# Add markdown filter for Jinja templates
-@app.template_filter('markdown')
-def markdown_filter(text):
-    return Markup(markdown.markdown(text, extensions=[
-        'fenced_code',
-        'tables',
-        'nl2br',
-        'sane_lists',
-        'pymdownx.magiclink'
-    ]))
+def create_app(config=None):
+    """
+    Application factory (used by `flask run` and WSGI servers as app:create_app()).
 
-app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    Applies pending migrations and sets up sessions. This process's job
+    workers start with the first request it serves, so CLI commands (which
+    serve none) never claim jobs. The Gemini client, python-docx and markdown are not loaded
+    here; they are imported on first use, so pages like /login and /classes
+    never pay for them.
 
-Session(app)
+    Args:
+        config (dict, optional): Config overrides (e.g. {"START_WORKERS": False})
+    Returns:
+        Flask: The configured application
+    """
+    app = Flask(__name__)
+    app.config["SESSION_PERMANENT"] = False
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    # Room for the other form fields on top of the files; each syllabus is
+    # still limited to MAX_UPLOAD_BYTES while it streams in
+    app.config['MAX_CONTENT_LENGTH'] = MAX_BATCH_UPLOAD_BYTES + 64 * 1024
+    app.config["START_WORKERS"] = True
+    app.config.update(config or {})
 
-@app.teardown_appcontext
-def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    # Stream uploads straight to disk, hashing and checking them on the way
+    app.request_class = UploadRequest
 
-@app.route("/result")
-@login_required
-def result():
-    username = session.get("username")
-    user_files = os.listdir(app.config['UPLOAD_FOLDER'])
-    user_file = None
-    
-    for file in user_files:
-        if file.startswith(f"{username}_"):
-            user_file = os.path.join(app.config['UPLOAD_FOLDER'], file)
+    app.register_blueprint(bp)
+    # Connections are per thread and stay open; this only resets them
+    app.teardown_appcontext(release_db)
+
+    # Create the database and apply any pending migrations
+    init_db()
+
+    # Session store: "sqlite" (default), "cookie" or "filesystem"
+    init_sessions(app, os.getenv("SESSION_BACKEND", "sqlite"))
+    return app
+
+@bp.before_app_request
+def start_job_workers():
+    # Background workers that process queued syllabus uploads (once per process)
+    if current_app.config["START_WORKERS"]:
+        start_workers(current_app._get_current_object())
+
+@bp.before_app_request
+def start_request_timer():
+    if metrics.METRICS_ENABLED:
+        g._request_started = time.perf_counter()
+
+@bp.after_app_request
+def record_request_time(response):
+    started = g.pop('_request_started', None)
+    if started is not None:
+        metrics.http_seconds.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched', method=request.method, status=response.status_code
+        )
+    return response
+
+
+@bp.app_errorhandler(RequestEntityTooLarge)
+@bp.app_errorhandler(UnsupportedMediaType)
+def upload_rejected(e):
+    """Uploads rejected while streaming (too large or wrong content)"""
+    if isinstance(e, RequestEntityTooLarge) and e.description == RequestEntityTooLarge.description:
+        # Raised by Flask for the request as a whole
+        flash(f"Upload is too large (max {MAX_BATCH_UPLOAD_BYTES // (1024 * 1024)} MB in total).", "danger")
+    else:
+        flash(e.description, "danger")
+    return redirect("/upload")
+
+@bp.cli.command("invalidate-cache")
+@click.argument("kind", required=False)
+@click.option("--stale-only", is_flag=True, help="Only drop entries from outdated prompt/model versions.")
+def invalidate_cache_command(kind, stale_only):
+    """Drop cached AI results (optionally only one KIND: validation, summary, resources, schedule)."""
+    removed = invalidate_cache(kind, stale_only=stale_only)
+    print(f"Removed {removed} cached result(s).")
+
+@bp.cli.command("compress-results")
+@click.option("--vacuum", is_flag=True, help="Run VACUUM afterwards to return the freed space to the OS.")
+def compress_results_command(vacuum):
+    """Convert all results to the current storage format now (workers also do this in the background)."""
+    total = 0
+    while True:
+        converted = compress_legacy_results()
+        if not converted:
             break
+        total += converted
+    print(f"Converted {total} result(s).")
+    if vacuum:
+        get_db().execute("VACUUM")
+        print("Database vacuumed.")
+
+@bp.cli.command("index-search")
+@click.option("--rebuild", is_flag=True, help="Drop the index and index every result again.")
+def index_search_command(rebuild):
+    """Add results missing from the search index now (workers also do this in the background)."""
+    if rebuild:
+        # Re-reads every result through the index's content view, in one transaction
+        with transaction() as db:
+            db.execute("INSERT INTO results_search (results_search) VALUES ('rebuild')")
+            total = db.execute("SELECT COUNT(*) FROM results_search_docsize").fetchone()[0]
+        get_db().execute("INSERT INTO results_search (results_search) VALUES ('optimize')")
+        get_db().commit()
+        print(f"Indexed {total} result(s).")
+        return
+    total = 0
+    after_id = 0
+    while True:
+        indexed, after_id = index_unindexed_results(after_id)
+        if not indexed:
+            break
+        total += indexed
+    print(f"Indexed {total} result(s).")
+
+@bp.route("/metrics")
+def metrics_endpoint():
+    """Latency, token and cache metrics in the Prometheus text format"""
+    if not (metrics.METRICS_ENABLED and METRICS_TOKEN):
+        return Response("Metrics are disabled\n", status=404, mimetype="text/plain")
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied, f"Bearer {METRICS_TOKEN}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
-    if not user_file:
-        flash("No uploaded file found.", "danger")
+@bp.route("/jobs/<int:job_id>")
+@login_required
+def job_status_page(job_id):
+    """Show a processing page that polls the job until its result is saved"""
+    job = get_job(job_id, session.get('user_id'))
+    if not job:
+        flash("Upload not found.", "danger")
         return redirect("/upload")
+    if job['status'] == 'done':
+        return redirect(f"/class/{job['result_id']}")
+    return render_template("status.html", job=job)
 
-    summary = ai_analyze_file(user_file)
-    resources = ai_generate_resources(user_file)
-    
-    # Get course name from session (custom name or filename)
-    course_name = session.get('course_name')
-    if not course_name:
-        original_filename = session.get('uploaded_filename', 'Unknown Course')
-        course_name = original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename
-    
-    # Get semester dates from session
-    semester_start = session.get('semester_start_date')
-    semester_end = session.get('semester_end_date')
-    
-    # Generate ICS file
-    ics_content = None
-    if semester_start and semester_end:
-        print("Generating ICS calendar file...")
-        ics_content = ai_generate_ics(user_file, course_name, semester_start, semester_end)
-    else:
-        print("Skipping ICS generation - semester dates not provided")
-    
-    # Save to database before deleting file
-    result_id = add_syllabus_result(
-        user_id=session.get('user_id'),
-        name=course_name,
-        summary=summary,
-        resources=resources,
-        semester_start_date=semester_start,
-        semester_end_date=semester_end
+@bp.route("/jobs/<int:job_id>/status")
+@login_required
+def job_status(job_id):
+    """JSON status of a processing job (queued, running, done or failed)"""
+    job = get_job(job_id, session.get('user_id'))
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({
+        "id": job['id'],
+        "status": job['status'],
+        "result_id": job['result_id'],
+        "error": job['error']
+    })
+
+@bp.route("/jobs/<int:job_id>/stream")
+@login_required
+def job_stream(job_id):
+    """Stream a job's summary and resources to the browser as they are generated"""
+    user_id = session.get('user_id')
+    if not get_job(job_id, user_id):
+        return jsonify({"error": "Job not found"}), 404
+    return Response(
+        stream_with_context(stream_job_events(job_id, user_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
-    
-    # Update ICS in database if generated
-    if ics_content and result_id:
-        from helpers import execute_db
-        execute_db('UPDATE results SET ics = ? WHERE id = ?', [ics_content, result_id])
-        print(f"ICS file saved to database for result ID: {result_id}")
-    
-    # Clean up the file after both operations complete
-    try:
-        if os.path.exists(user_file):
-            os.remove(user_file)
-    except:
-        pass
-    
-    # Clear the session data
-    session.pop('uploaded_filename', None)
-    session.pop('course_name', None)
-    session.pop('semester_start_date', None)
-    session.pop('semester_end_date', None)
-    
-    return render_template("result.html", 
-                         summary=summary, 
-                         resources=resources, 
-                         course_name=course_name, 
-                         semester_start=semester_start, 
-                         semester_end=semester_end,
-                         result_id=result_id,
-                         has_ics=ics_content is not None)
-
-@app.route("/upload", methods=["GET", "POST"])
+
+@bp.route("/upload", methods=["GET", "POST"])
 @login_required
 def upload():
     if request.method == "POST":
@@ -124,84 +208,124 @@ def upload():
             flash("No file part", "danger")
             return redirect(request.url)
 
-        file = request.files['file']
+        files = [f for f in request.files.getlist('file') if f.filename]
 
-        if file.filename == '':
+        if not files:
             flash("No selected file", "danger")
             return redirect(request.url)
 
+        # Get semester dates from form (optional)
+        semester_start = request.form.get('semester_start_date') or None
+        semester_end = request.form.get('semester_end_date') or None
+
+        if len(files) > 1 or is_archive(files[0].filename):
+            return _upload_batch(files, semester_start, semester_end)
+
+        file = files[0]
         if file and allowed_file(file.filename):
-            filename = f"{session.get('username')}_{secure_filename(file.filename)}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Store original filename and custom course name in session
-            session['uploaded_filename'] = file.filename
+            # Already written to disk and hashed by UploadStream while parsing
+            filepath, file_hash = file.stream.commit()
             
-            # Get custom course name from form (optional)
+            # Use the custom course name from the form, or fall back to the filename
             course_name = request.form.get('course_name', '').strip()
-            if course_name:
-                session['course_name'] = course_name
+            if not course_name:
+                course_name = _course_name_from_filename(file.filename)
             
-            # Get semester dates from form (optional)
-            semester_start = request.form.get('semester_start_date')
-            semester_end = request.form.get('semester_end_date')
-            
-            # Store in session if provided
-            if semester_start:
-                session['semester_start_date'] = semester_start
-            if semester_end:
-                session['semester_end_date'] = semester_end
-            
-            # Validate if file is a syllabus
-            is_valid, message = ai_validate_syllabus(filepath)
-            print(f"Syllabus validation: {is_valid}, {message}")
-            if not is_valid:
-                # Delete the invalid file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                session.pop('uploaded_filename', None)
-                session.pop('course_name', None)
-                session.pop('semester_start_date', None)
-                session.pop('semester_end_date', None)
-                flash(f"Invalid file: {message}. Please upload a course syllabus.", "danger")
-                return redirect("/upload")
+            # Validation and analysis run in the background job queue
+            job_id = enqueue_job(session.get('user_id'), filepath, course_name, semester_start, semester_end,
+                                 file_hash=file_hash)
             
             flash("File uploaded successfully", "success")
-            return redirect("/result")
+            return redirect(f"/jobs/{job_id}")
         else:
             flash("File type not allowed", "danger")
             return redirect(request.url)
     
     # GET request - get most recent syllabus for default dates
-    user_id = session.get('user_id')
-    recent_results = get_user_results(user_id)
-    
-    default_start = None
-    default_end = None
-    
-    if recent_results and len(recent_results) > 0:
-        most_recent = recent_results[-1]
-        default_start = most_recent.get('semester_start_date')
-        default_end = most_recent.get('semester_end_date')
+    default_start, default_end = get_latest_semester_dates(session.get('user_id'))
     
     return render_template("request.html", 
                          default_start=default_start, 
-                         default_end=default_end)
+                         default_end=default_end,
+                         max_batch_files=MAX_BATCH_FILES)
 
-@app.route("/classes")
+def _upload_batch(files, semester_start, semester_end):
+    """Queue several uploaded syllabi (files and/or zips) as one batch"""
+    entries = []
+    try:
+        for file in files:
+            filepath, file_hash = file.stream.commit()
+            if is_archive(file.filename):
+                entries.extend(extract_upload_archive(filepath))
+            else:
+                entries.append((file.filename, filepath, file_hash))
+            if len(entries) > MAX_BATCH_FILES:
+                raise RequestEntityTooLarge(f"Too many files (max {MAX_BATCH_FILES} per upload).")
+    except Exception:
+        for _, filepath, _ in entries:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        raise
+
+    batch_id = enqueue_batch(
+        session.get('user_id'),
+        [(_course_name_from_filename(filename), filepath, file_hash) for filename, filepath, file_hash in entries],
+        semester_start, semester_end
+    )
+    flash(f"{len(entries)} files uploaded successfully", "success")
+    return redirect(f"/batches/{batch_id}")
+
+def _course_name_from_filename(filename):
+    return filename.rsplit('.', 1)[0] if '.' in filename else filename
+
+@bp.route("/batches/<int:batch_id>")
+@login_required
+def batch_status_page(batch_id):
+    """Show the progress of every file in a bulk upload"""
+    batch = get_batch(batch_id, session.get('user_id'))
+    if not batch:
+        flash("Upload not found.", "danger")
+        return redirect("/upload")
+    return render_template("batch.html", batch=batch)
+
+@bp.route("/batches/<int:batch_id>/status")
+@login_required
+def batch_status(batch_id):
+    """JSON status of a bulk upload and each of its jobs"""
+    batch = get_batch(batch_id, session.get('user_id'))
+    if not batch:
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify({
+        "id": batch['id'],
+        "status": batch['status'],
+        "jobs": batch['jobs']
+    })
+
+@bp.route("/classes")
 @login_required
 def classes():
     """Display the user's uploaded syllabuses dashboard"""
     user_id = session.get('user_id')
-    user_syllabuses = get_user_results(user_id)
-    return render_template("classes.html", syllabuses=user_syllabuses)
+    user_syllabuses, next_cursor = get_user_results(user_id, before=request.args.get('before'))
+    default_start, default_end = get_latest_semester_dates(user_id)
+    feed_url = url_for('main.calendar_feed', token=get_calendar_token(user_id), _external=True)
+    return render_template("classes.html", syllabuses=user_syllabuses, next_cursor=next_cursor,
+                           default_start=default_start, default_end=default_end, feed_url=feed_url)
 
-@app.route("/")
+@bp.route("/search")
+@login_required
+def search():
+    """Search the user's saved classes (names, summaries, resources and calendar events)"""
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = search_results(session.get('user_id'), query, page) if query else ([], False)
+    return render_template("search.html", query=query, results=results, page=page, has_next=has_next)
+
+@bp.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     session.clear()
 
@@ -230,12 +354,12 @@ def login():
     
     return render_template("login.html")
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     session.clear()
     return redirect("/")
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         username = request.form.get("username")
@@ -262,18 +386,21 @@ def register():
             return redirect("/register")
 
         hash_pwd = generate_password_hash(password)
-        execute_db('INSERT INTO users (username, hash) VALUES(?, ?)', [username, hash_pwd])
-        
-        users = query_db("SELECT * FROM users WHERE username = ?", [username])
-        user = dict(users[0])
-        session["user_id"] = user["id"]
-        session["username"] = user["username"]
+        try:
+            user_id = execute_db('INSERT INTO users (username, hash) VALUES(?, ?)', [username, hash_pwd])
+        except sqlite3.IntegrityError:
+            # Taken by a concurrent registration since the check above
+            flash("Username already taken", "danger")
+            return redirect("/register")
+
+        session["user_id"] = user_id
+        session["username"] = username
 
         return redirect("/")
     
     return render_template("register.html")
 
-@app.route("/download/ics/<int:result_id>")
+@bp.route("/download/ics/<int:result_id>")
 @login_required
 def download_ics(result_id):
     """Download ICS calendar file for a specific result"""
@@ -283,7 +410,10 @@ def download_ics(result_id):
     user_id = session.get('user_id')
     
     # Get the specific result
-    result = query_db('SELECT * FROM results WHERE id = ? AND user_id = ?', [result_id, user_id], one=True)
+    result = query_db(
+        'SELECT name, ics, storage_format FROM results WHERE id = ? AND user_id = ?',
+        [result_id, user_id], one=True
+    )
     
     if not result:
         flash("Class not found.", "danger")
@@ -296,43 +426,121 @@ def download_ics(result_id):
         flash("No calendar file available for this class.", "warning")
         return redirect(f"/class/{result_id}")
     
+    # Stored gzip bytes go out as they are to clients that accept gzip
+    send_gzip = result_dict['storage_format'] == 1 and request.accept_encodings['gzip'] > 0
+    if not send_gzip:
+        ics_blob = unpack_result_field(ics_blob, result_dict['storage_format'], binary=True)
+    
     # Create a filename based on course name
-    course_name = result_dict.get('name', 'course')
+    course_name = result_dict.get('name') or 'course'
     safe_filename = "".join(c for c in course_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
     filename = f"{safe_filename}_calendar.ics"
     
     # Send the file
-    return send_file(
+    response = send_file(
         io.BytesIO(ics_blob),
         mimetype='text/calendar',
         as_attachment=True,
         download_name=filename
     )
+    if send_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@bp.route("/calendar/<token>.ics")
+def calendar_feed(token):
+    """
+    Subscription feed with the calendars of all of a user's classes.
+
+    Calendar apps poll this without the session cookie, so the secret token
+    in the URL identifies the user. Unchanged feeds get a 304 from the
+    ETag/Last-Modified check before any ICS is read.
+    """
+    user_id = get_calendar_feed_user(token)
+    if user_id is None:
+        return Response("Calendar not found", status=404, mimetype="text/plain")
+
+    etag, updated_at = calendar_feed_version(user_id)
+    last_modified = datetime.fromtimestamp(updated_at, timezone.utc) if updated_at else None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(get_calendar_feed(user_id, etag), mimetype='text/calendar')
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Clients may keep the feed but must revalidate before using it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route("/class/<int:class_id>/dates", methods=["POST"])
+@login_required
+def change_class_dates(class_id):
+    """Set new semester dates for one class and rebuild its calendar"""
+    try:
+        updated, skipped = rebuild_calendars(
+            session.get('user_id'),
+            request.form.get('semester_start_date'),
+            request.form.get('semester_end_date'),
+            result_ids=[class_id]
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(f"/class/{class_id}")
+
+    if updated:
+        flash("Semester dates updated and calendar rebuilt.", "success")
+    elif skipped:
+        flash("This class has no stored schedule. Please upload the syllabus again.", "warning")
+    else:
+        flash("Class not found.", "danger")
+        return redirect("/classes")
+    return redirect(f"/class/{class_id}")
+
+@bp.route("/classes/dates", methods=["POST"])
+@login_required
+def change_all_dates():
+    """Roll all of the user's classes to new semester dates, rebuilding every calendar"""
+    try:
+        updated, skipped = rebuild_calendars(
+            session.get('user_id'),
+            request.form.get('semester_start_date'),
+            request.form.get('semester_end_date')
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect("/classes")
+
+    message = f"Rebuilt {updated} calendar(s) for the new semester dates."
+    if skipped:
+        message += f" {skipped} older class(es) have no stored schedule and were not changed."
+    flash(message, "success" if updated else "warning")
+    return redirect("/classes")
 
-@app.route("/class/<int:class_id>")
+@bp.route("/class/<int:class_id>")
 @login_required
 def view_class(class_id):
     """View details of a specific class/syllabus"""
     user_id = session.get('user_id')
     
-    # Get the specific result
-    result = query_db('SELECT * FROM results WHERE id = ? AND user_id = ?', [class_id, user_id], one=True)
+    # Get the specific result (with its pre-rendered resources HTML)
+    result = get_result_for_view(class_id, user_id)
     
     if not result:
         flash("Class not found.", "danger")
         return redirect("/classes")
     
-    result_dict = dict(result)
-    has_ics = result_dict.get('ics') is not None
-    
     return render_template("result.html", 
-                         summary=result_dict['summary'], 
-                         resources=result_dict['resources'],
-                         course_name=result_dict['name'],
-                         semester_start=result_dict.get('semester_start_date'),
-                         semester_end=result_dict.get('semester_end_date'),
+                         summary=result['summary'], 
+                         resources_html=Markup(result['resources_html']),
+                         course_name=result['name'],
+                         semester_start=result['semester_start_date'],
+                         semester_end=result['semester_end_date'],
                          result_id=class_id,
-                         has_ics=has_ics)
+                         has_ics=bool(result['has_ics']),
+                         has_schedule=bool(result['has_schedule']))
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
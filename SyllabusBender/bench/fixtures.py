@@ -0,0 +1,149 @@
+"""
+Fixture syllabi for the benchmarks, generated on demand (no binaries in the
+repository): the same syllabus text as TXT, PDF and DOCX at several sizes.
+"""
+import io
+import os
+import random
+
+from docx import Document
+
+# Approximate amount of text per size
+SIZES = {'small': 2_000, 'medium': 20_000, 'large': 200_000}
+FORMATS = ('pdf', 'txt', 'docx')
+
+_TOPICS = (
+    'Introduction and course overview', 'Asymptotic analysis', 'Sorting algorithms', 'Hash tables',
+    'Binary search trees', 'Graph traversal', 'Shortest paths', 'Dynamic programming',
+    'Greedy algorithms', 'Network flow', 'NP-completeness', 'Approximation algorithms',
+    'Randomized algorithms', 'Review and final project presentations'
+)
+
+def syllabus_text(target_chars, seed=0):
+    """Plausible syllabus text of roughly `target_chars` characters"""
+    rng = random.Random(seed)
+    lines = [
+        'CS 301: Data Structures and Algorithms - Course Syllabus',
+        'Instructor: Dr. Ada Lovelace (ada@example.edu)',
+        'Office hours: Tuesday 14:00-15:00, Room 214',
+        'Lectures: Monday and Wednesday 10:00-11:15, Hall B',
+        '',
+        'Course description',
+        'This course covers the design and analysis of fundamental algorithms and data structures.',
+        'Prerequisite: CS 201. Required textbook: Introduction to Algorithms (Cormen et al.).',
+        '',
+        'Grading: homework 30%, midterm 30%, final exam 40%. Attendance is expected at every lecture.',
+        'Academic integrity: all assignments must be your own work.',
+        '',
+        'Course schedule'
+    ]
+    week = 0
+    while sum(len(line) + 1 for line in lines) < target_chars:
+        topic = _TOPICS[week % len(_TOPICS)]
+        lines.append(f'Week {week + 1}: {topic}. Reading: chapter {rng.randint(1, 35)}. '
+                     f'Homework {week + 1} due Friday of week {week + 2}.')
+        lines.append(' '.join(rng.choice(_TOPICS).lower() for _ in range(6)) + '.')
+        week += 1
+    return '\n'.join(lines) + '\n'
+
+def make_txt(text):
+    return text.encode('utf-8')
+
+def _pdf_escape(line):
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def make_pdf(text, lines_per_page=60):
+    """A minimal valid multi-page PDF with the text in Helvetica"""
+    lines = text.splitlines()
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = {}
+    page_ids = []
+    next_id = 4
+    for page_lines in pages:
+        content = ['BT', '/F1 10 Tf', '12 TL', '50 780 Td']
+        content.extend(f'({_pdf_escape(line.encode("latin-1", "replace").decode("latin-1"))}) Tj T*'
+                       for line in page_lines)
+        content.append('ET')
+        stream = '\n'.join(content).encode('latin-1')
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+        objects[page_id] = (b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id)
+        page_ids.append(page_id)
+    objects[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[2] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % i for i in page_ids), len(page_ids))
+    objects[3] = b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = out.tell()
+        out.write(b'%d 0 obj\n' % obj_id + objects[obj_id] + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for obj_id in sorted(objects):
+        out.write(b'%010d 00000 n \n' % offsets[obj_id])
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def make_docx(text):
+    """A DOCX with a heading, paragraphs and the weekly schedule as a table"""
+    document = Document()
+    lines = text.splitlines()
+    document.add_heading(lines[0], level=1)
+    table = None
+    for line in lines[1:]:
+        if line.startswith('Week '):
+            if table is None:
+                table = document.add_table(rows=0, cols=2)
+            week, _, rest = line.partition(': ')
+            cells = table.add_row().cells
+            cells[0].text = week
+            cells[1].text = rest
+        elif line:
+            document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+_BUILDERS = {'txt': make_txt, 'pdf': make_pdf, 'docx': make_docx}
+
+def build_fixtures(directory, formats=FORMATS, sizes=tuple(SIZES)):
+    """
+    Write the fixture files (reused if already there).
+
+    Returns:
+        list: dicts with 'name', 'format', 'size', 'path' and 'bytes'
+    """
+    os.makedirs(directory, exist_ok=True)
+    fixtures = []
+    for size in sizes:
+        text = syllabus_text(SIZES[size], seed=len(size))
+        for fmt in formats:
+            name = f'syllabus-{size}.{fmt}'
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                with open(path, 'wb') as f:
+                    f.write(_BUILDERS[fmt](text))
+            fixtures.append({'name': name, 'format': fmt, 'size': size, 'path': path,
+                             'bytes': os.path.getsize(path)})
+    return fixtures
+
+def unique_variant(data, fmt, nonce):
+    """
+    The same document with a few different bytes, so each upload has its own
+    content hash and misses the result cache.
+    """
+    nonce = nonce.encode('ascii')
+    if fmt == 'docx':
+        # Set the ZIP archive comment (python-docx writes an empty one)
+        if data[-22:-18] == b'PK\x05\x06' and data[-2:] == b'\x00\x00':
+            return data[:-2] + len(nonce).to_bytes(2, 'little') + nonce
+        return data
+    if fmt == 'pdf':
+        return data + b'%' + nonce + b'\n'
+    return data + b'\n' + nonce + b'\n'
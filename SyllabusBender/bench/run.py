@@ -0,0 +1,480 @@
+"""
+Offline benchmark and load test for Syllabus Bender.
+
+Gemini is replaced by ai_client.FakeClient with configurable latency and
+token rate, so no API quota is used. Virtual users register, upload the
+fixture syllabi (PDF, TXT, DOCX at several sizes), wait for each job, then
+open /classes, /class/<id> and /download/ics/<id>.
+
+Modes:
+    inprocess  Flask test client in this process (helpers.client swapped for the stub)
+    wsgi       several server processes on one shared database, driven over HTTP
+
+Usage (from the SyllabusBender directory):
+    python bench/run.py --mode both --users 8 --iterations 5
+    python bench/run.py --mode wsgi --server-workers 4 --compare bench/results/<previous>.json
+
+Latency percentiles (p50/p95/p99) per endpoint, requests per second, job
+end-to-end times and the server-side stage timings from /metrics are
+printed and saved as JSON in bench/results/.
+"""
+import argparse
+import atexit
+import contextlib
+import http.cookiejar
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fixtures import FORMATS, SIZES, build_fixtures, unique_variant
+
+# /metrics only answers requests carrying the server's token
+METRICS_TOKEN = uuid.uuid4().hex
+METRICS_HEADERS = {'Authorization': f'Bearer {METRICS_TOKEN}'}
+
+# --- Measurements ---
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50_ms': _ms(percentile(values, 50)),
+        'p95_ms': _ms(percentile(values, 95)),
+        'p99_ms': _ms(percentile(values, 99)),
+        'mean_ms': _ms(sum(values) / len(values)) if values else None,
+        'max_ms': _ms(max(values)) if values else None
+    }
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+class Recorder:
+    """Thread-safe collection of request timings per endpoint"""
+
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+        self.jobs = []
+        self.failed_jobs = 0
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok=True):
+        with self.lock:
+            self.timings.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def record_job(self, seconds, ok):
+        with self.lock:
+            if ok:
+                self.jobs.append(seconds)
+            else:
+                self.failed_jobs += 1
+
+    def report(self, duration):
+        requests = sum(len(values) for values in self.timings.values())
+        endpoints = {}
+        for endpoint, values in sorted(self.timings.items()):
+            endpoints[endpoint] = summarize(values)
+            endpoints[endpoint]['errors'] = self.errors.get(endpoint, 0)
+        jobs = summarize(self.jobs)
+        jobs['failed'] = self.failed_jobs
+        return {
+            'duration_s': round(duration, 3),
+            'requests': requests,
+            'errors': sum(self.errors.values()),
+            'requests_per_second': round(requests / duration, 2) if duration else None,
+            'jobs_per_second': round(len(self.jobs) / duration, 3) if duration else None,
+            'endpoints': endpoints,
+            'jobs': jobs
+        }
+
+_STAGE_LINE = re.compile(r'^syllabus_stage_seconds_(sum|count)\{stage="([^"]+)"\} ([0-9.e+-]+)$')
+
+def parse_stage_metrics(texts):
+    """Mean seconds per processing stage from one or more /metrics payloads"""
+    totals = {}
+    for text in texts:
+        for line in text.splitlines():
+            match = _STAGE_LINE.match(line)
+            if match:
+                kind, stage, value = match.groups()
+                totals.setdefault(stage, {'sum': 0.0, 'count': 0})[kind] += float(value)
+    return {
+        stage: {'count': int(t['count']), 'mean_ms': _ms(t['sum'] / t['count']) if t['count'] else None}
+        for stage, t in sorted(totals.items())
+    }
+
+# --- Virtual Users ---
+class VirtualUser:
+    """
+    One simulated student. `http` is a small adapter over the Flask test
+    client or urllib (with its own cookies) with get(path) / post(path, data, files).
+    """
+
+    def __init__(self, index, http, recorder, fixtures, args):
+        self.index = index
+        self.http = http
+        self.recorder = recorder
+        self.fixtures = fixtures
+        self.args = args
+
+    def timed(self, endpoint, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, location, body = getattr(self.http, method)(path, **kwargs)
+            ok = status < 400
+        except Exception:
+            status, location, body, ok = 0, None, b'', False
+        self.recorder.record(endpoint, time.perf_counter() - started, ok)
+        return status, location, body
+
+    def run(self):
+        username = f"bench-{uuid.uuid4().hex[:10]}"
+        self.timed('/register', 'post', '/register',
+                   data={'username': username, 'password': 'bench', 'confirmation': 'bench'})
+        for iteration in range(self.args.iterations):
+            fixture = self.fixtures[(self.index + iteration) % len(self.fixtures)]
+            with open(fixture['path'], 'rb') as f:
+                data = f.read()
+            if not self.args.cache:
+                data = unique_variant(data, fixture['format'], uuid.uuid4().hex)
+            form = {'course_name': f"{fixture['size']} {fixture['format']} {iteration}",
+                    'semester_start_date': '2026-09-01', 'semester_end_date': '2026-12-15'}
+
+            started = time.perf_counter()
+            status, location, _ = self.timed('/upload', 'post', '/upload', data=form,
+                                             files={'file': (fixture['name'], data)})
+            match = re.search(r'/jobs/(\d+)', location or '')
+            if not match:
+                self.recorder.record_job(0, False)
+                continue
+            result_id = self.wait_for_job(match.group(1))
+            self.recorder.record_job(time.perf_counter() - started, result_id is not None)
+
+            self.timed('/classes', 'get', '/classes')
+            if result_id is not None:
+                self.timed('/class/<id>', 'get', f'/class/{result_id}')
+                self.timed('/download/ics/<id>', 'get', f'/download/ics/{result_id}')
+
+    def wait_for_job(self, job_id):
+        deadline = time.monotonic() + self.args.job_timeout
+        while time.monotonic() < deadline:
+            status, _, body = self.timed('/jobs/<id>/status', 'get', f'/jobs/{job_id}/status')
+            if status == 200:
+                job = json.loads(body)
+                if job['status'] == 'done':
+                    return job['result_id']
+                if job['status'] == 'failed':
+                    return None
+            time.sleep(self.args.poll_interval)
+        return None
+
+class FlaskHttp:
+    """Adapter for the Flask test client"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.location, response.data
+
+    def post(self, path, data=None, files=None):
+        payload = dict(data or {})
+        for field, (filename, content) in (files or {}).items():
+            payload[field] = (io.BytesIO(content), filename)
+        response = self.client.post(path, data=payload, content_type='multipart/form-data')
+        return response.status_code, response.location, response.data
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects (as HTTPError) instead of following them"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def _multipart(data, files):
+    """Encode form fields and (filename, bytes) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in (data or {}).items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in (files or {}).items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+class UrllibHttp:
+    """Adapter for urllib against one or more server processes (round robin), keeping cookies"""
+
+    def __init__(self, base_urls):
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect
+        )
+        self.base_urls = base_urls
+        self.turn = 0
+
+    def _url(self, path):
+        self.turn += 1
+        return self.base_urls[self.turn % len(self.base_urls)] + path
+
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.headers.get('Location'), response.read()
+        except urllib.error.HTTPError as response:
+            # Redirects and error statuses
+            return response.code, response.headers.get('Location'), response.read()
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self._url(path)))
+
+    def post(self, path, data=None, files=None):
+        body, content_type = _multipart(data, files)
+        return self._send(urllib.request.Request(self._url(path), data=body, method='POST',
+                                                 headers={'Content-Type': content_type}))
+
+def _http_get(url, headers=None, timeout=10):
+    """GET a URL with urllib; returns (status, body text)"""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=timeout) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as response:
+        return response.code, response.read().decode('utf-8')
+
+def run_users(make_http, recorder, fixtures, args):
+    users = [VirtualUser(i, make_http(), recorder, fixtures, args) for i in range(args.users)]
+    threads = [threading.Thread(target=user.run, name=f"bench-user-{user.index}") for user in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+# --- Modes ---
+def _stub_environment(args):
+    """Environment for the app under test: fake Gemini, no rate limit, quiet spans"""
+    return {
+        'AI_BACKEND': 'fake',
+        'FAKE_AI_LATENCY': str(args.latency),
+        'FAKE_AI_TOKENS_PER_SECOND': str(args.tokens_per_second),
+        'FAKE_AI_UPLOAD_LATENCY': str(args.upload_latency),
+        'GEMINI_RPM': '1000000',
+        'GEMINI_BURST': '100000',
+        'SPAN_LOG': '0',
+        'METRICS_ENABLED': '1',
+        'METRICS_TOKEN': METRICS_TOKEN,
+        'SECRET_KEY': 'bench'
+    }
+
+def run_inprocess(args, fixtures, workdir):
+    os.environ.update(_stub_environment(args))
+    os.chdir(workdir)
+    log_path = os.path.join(workdir, 'inprocess.log')
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log):
+        import helpers
+        # The job workers keep polling after the run; pin them to this database
+        helpers.DATABASE = os.path.join(workdir, helpers.DATABASE)
+        from ai_client import FakeClient, ResilientClient, TokenBucket
+        # Swap the module-level client for the stub (same wrapper as production)
+        helpers.client = ResilientClient(
+            FakeClient(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                       upload_latency=args.upload_latency),
+            limiter=TokenBucket(1_000_000, 100_000)
+        )
+        from app import create_app
+        flask_app = create_app({'TESTING': True})
+
+        recorder = Recorder()
+        duration = run_users(lambda: FlaskHttp(flask_app.test_client()), recorder, fixtures, args)
+        metrics_text = flask_app.test_client().get('/metrics', headers=METRICS_HEADERS).get_data(as_text=True)
+
+    report = recorder.report(duration)
+    report['stages'] = parse_stage_metrics([metrics_text])
+    return report
+
+def _serve(port, workdir, env):
+    """Server process entry point: import the app fresh and serve it with werkzeug"""
+    os.environ.update(env)
+    os.chdir(workdir)
+    sys.stdout = sys.stderr = open(os.path.join(workdir, f'server-{port}.log'), 'w', buffering=1)
+    from werkzeug.serving import make_server
+    from app import create_app
+    from helpers import shutdown_extract_pool
+
+    def stop(signum, frame):
+        # Stop the text extraction processes, or terminate() orphans them
+        shutdown_extract_pool()
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, stop)
+    make_server('127.0.0.1', port, create_app(), threaded=True).serve_forever()
+
+def _free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_wsgi(args, fixtures, workdir):
+    env = _stub_environment(args)
+    # Workers share one database; the first creates it so the others don't race
+    env_first = dict(env)
+    context = multiprocessing.get_context('spawn')
+    ports = [_free_port() for _ in range(args.server_workers)]
+    servers = []
+    try:
+        for i, port in enumerate(ports):
+            # Not daemonic, so the servers can start their text extraction pools
+            server = context.Process(target=_serve, args=(port, workdir, env_first if i == 0 else env))
+            server.start()
+            servers.append(server)
+            _wait_until_up(f'http://127.0.0.1:{port}')
+
+        base_urls = [f'http://127.0.0.1:{port}' for port in ports]
+        recorder = Recorder()
+        duration = run_users(lambda: UrllibHttp(base_urls), recorder, fixtures, args)
+        metrics_texts = [_http_get(f'{url}/metrics', headers=METRICS_HEADERS)[1] for url in base_urls]
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.join(timeout=5)
+
+    report = recorder.report(duration)
+    report['stages'] = parse_stage_metrics(metrics_texts)
+    return report
+
+def _wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if _http_get(base_url + '/', timeout=1)[0] == 200:
+                return
+        except OSError:
+            # Not listening yet
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+# --- Reporting ---
+def print_report(mode, report, baseline=None):
+    print(f"\n== {mode}: {report['requests']} requests in {report['duration_s']}s "
+          f"({report['requests_per_second']} req/s, {report['errors']} errors) ==")
+    print(f"{'endpoint':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+          + (f"{'p95 vs base':>13}" if baseline else ''))
+    rows = list(report['endpoints'].items()) + [('job end-to-end', report['jobs'])]
+    for name, stats in rows:
+        line = (f"{name:<22}{stats['count']:>7}{_fmt(stats['p50_ms']):>10}{_fmt(stats['p95_ms']):>10}"
+                f"{_fmt(stats['p99_ms']):>10}{stats.get('errors', stats.get('failed', 0)):>8}")
+        if baseline:
+            base = baseline['jobs'] if name == 'job end-to-end' else baseline['endpoints'].get(name)
+            line += f"{_delta(stats['p95_ms'], base and base['p95_ms']):>13}"
+        print(line)
+    if baseline:
+        print(f"req/s vs base: {_delta(report['requests_per_second'], baseline['requests_per_second'])}")
+    if report.get('stages'):
+        print("server stages (mean ms): " + ', '.join(
+            f"{stage}={_fmt(stats['mean_ms'])}" for stage, stats in report['stages'].items()))
+
+def _fmt(value):
+    return '-' if value is None else f'{value:.1f}'
+
+def _delta(value, base):
+    if value is None or not base:
+        return '-'
+    return f'{(value - base) / base * 100:+.1f}%'
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('inprocess', 'wsgi', 'both'), default='both')
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=3, help='uploads per user')
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--sizes', default=','.join(SIZES))
+    parser.add_argument('--latency', type=float, default=0.3, help='stub time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=200, help='stub output rate')
+    parser.add_argument('--upload-latency', type=float, default=0.1, help='stub file upload time (s)')
+    parser.add_argument('--server-workers', type=int, default=2, help='server processes in wsgi mode')
+    parser.add_argument('--cache', action='store_true',
+                        help='upload identical bytes so repeats hit the result cache')
+    parser.add_argument('--poll-interval', type=float, default=0.2)
+    parser.add_argument('--job-timeout', type=float, default=120)
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results'))
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    fixtures = build_fixtures(os.path.join(BENCH_DIR, 'fixtures'),
+                              formats=args.formats.split(','), sizes=args.sizes.split(','))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['modes']
+
+    modes = ('inprocess', 'wsgi') if args.mode == 'both' else (args.mode,)
+    reports = {}
+    for mode in modes:
+        workdir = tempfile.mkdtemp(prefix=f'syllabus-bench-{mode}-')
+        cwd = os.getcwd()
+        try:
+            if mode == 'inprocess':
+                reports[mode] = run_inprocess(args, fixtures, workdir)
+            else:
+                reports[mode] = run_wsgi(args, fixtures, workdir)
+        finally:
+            os.chdir(cwd)
+            if not os.environ.get('BENCH_KEEP_WORKDIR'):
+                # In-process workers are daemon threads that outlive the run
+                atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+        print_report(mode, reports[mode], baseline and baseline.get(mode))
+
+    os.makedirs(args.output, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(args.output, f'{timestamp}-{args.mode}.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'timestamp': timestamp,
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': vars(args),
+            'fixtures': [{k: fx[k] for k in ('name', 'format', 'size', 'bytes')} for fx in fixtures],
+            'modes': reports
+        }, f, indent=2)
+    print(f"\nResults saved to {path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Cold start benchmark: how long a fresh worker process takes to import the
+app, build it with create_app() and serve its first /login and /classes
+requests, with a `python -X importtime` breakdown of the imports.
+
+It also checks that the heavy libraries stay unloaded through all of that
+(google-genai, python-docx, markdown load on first use), and optionally
+that the import time stays within a budget. Exits with status 1 if a check
+fails, so it can gate CI.
+
+Usage (from the SyllabusBender directory):
+    python bench/startup.py --runs 5 --budget-ms 300
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+# Must not be imported before they are needed (i.e. by startup, /login or /classes)
+LAZY_MODULES = ('google.genai', 'httpx', 'docx', 'markdown', 'pymdownx', 'pypdf')
+
+# Run in the child process; prints one JSON line of timings and loaded modules
+_CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+import app as app_module
+imported = time.perf_counter()
+flask_app = app_module.create_app({{'TESTING': True, 'START_WORKERS': False}})
+created = time.perf_counter()
+client = flask_app.test_client()
+client.get('/login')
+first_request = time.perf_counter()
+client.post('/register', data={{'username': 'startup', 'password': 'pw', 'confirmation': 'pw'}})
+registered = time.perf_counter()
+client.get('/classes')
+classes = time.perf_counter()
+print('STARTUP ' + json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_login_ms': (first_request - created) * 1000,
+    'first_classes_ms': (classes - registered) * 1000,
+    'loaded': [m for m in {lazy!r} if m in sys.modules]
+}}))
+'''
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def parse_importtime(stderr):
+    """(module, self_us, cumulative_us, depth) for each line of -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+def run_once(python):
+    """One cold start in a fresh interpreter and a fresh database"""
+    with tempfile.TemporaryDirectory(prefix='syllabus-startup-') as workdir:
+        env = dict(os.environ, AI_BACKEND='fake', SPAN_LOG='0', SECRET_KEY='bench')
+        proc = subprocess.run(
+            [python, '-X', 'importtime', '-c', _CHILD.format(app_dir=APP_DIR, lazy=LAZY_MODULES)],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=120
+        )
+    line = next((l for l in proc.stdout.splitlines() if l.startswith('STARTUP ')), None)
+    if proc.returncode != 0 or line is None:
+        raise RuntimeError(f"Startup run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(line[len('STARTUP '):]), parse_importtime(proc.stderr)
+
+def top_imports(entries, limit):
+    """Slowest imports by cumulative time (nested entries included, to show what pulls in what)"""
+    ordered = sorted(entries, key=lambda entry: entry[2], reverse=True)
+    return [{'module': module, 'cumulative_ms': round(cumulative / 1000, 1), 'self_ms': round(own / 1000, 1),
+             'depth': depth} for module, own, cumulative, depth in ordered[:limit]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to take the median of')
+    parser.add_argument('--budget-ms', type=float, help='fail if the median import time exceeds this')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--python', default=sys.executable)
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results'))
+    args = parser.parse_args()
+
+    runs = [run_once(args.python) for _ in range(args.runs)]
+    timings = {key: round(statistics.median(run[key] for run, _ in runs), 1)
+               for key in ('import_ms', 'create_app_ms', 'first_login_ms', 'first_classes_ms')}
+    loaded = sorted({module for run, _ in runs for module in run['loaded']})
+    # Breakdown of the run whose import time is the median
+    median_run = sorted(runs, key=lambda run: run[0]['import_ms'])[len(runs) // 2]
+    imports = top_imports(median_run[1], args.top)
+
+    print(f"Cold start (median of {args.runs}): import {timings['import_ms']} ms, "
+          f"create_app {timings['create_app_ms']} ms, first /login {timings['first_login_ms']} ms, "
+          f"first /classes {timings['first_classes_ms']} ms")
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for entry in imports:
+        print(f"{entry['cumulative_ms']:>14}{entry['self_ms']:>10}  {'  ' * entry['depth']}{entry['module']}")
+
+    failures = []
+    if loaded:
+        failures.append(f"loaded at startup but should be lazy: {', '.join(loaded)}")
+    if args.budget_ms is not None and timings['import_ms'] > args.budget_ms:
+        failures.append(f"import took {timings['import_ms']} ms (budget {args.budget_ms} ms)")
+
+    os.makedirs(args.output, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(args.output, f'{timestamp}-startup.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'timestamp': timestamp,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': vars(args),
+            'timings': timings,
+            'lazy_modules_loaded': loaded,
+            'top_imports': imports,
+            'failures': failures
+        }, f, indent=2)
+    print(f"\nResults saved to {path}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
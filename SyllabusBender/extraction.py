@@ -0,0 +1,178 @@
+import os
+import re
+import unicodedata
+from collections import Counter
+
+# This module runs in the text extraction worker processes (see
+# helpers.SyllabusDocument.text), so it imports nothing from the app.
+# pypdf is imported on the first PDF.
+
+# --- Configuration ---
+# Running headers and footers are looked for in this many lines at the top
+# and bottom of each page, and must appear on at least this share of pages
+HEADER_FOOTER_LINES = 3
+HEADER_FOOTER_MIN_SHARE = 0.5
+
+# A PDF with fewer extracted characters per page than this on average is
+# treated as scanned (images only) and left to Gemini to read
+PDF_MIN_CHARS_PER_PAGE = int(os.getenv("PDF_MIN_CHARS_PER_PAGE", "80"))
+
+# Lines at least this long are dropped when they repeat an earlier line
+# verbatim (shorter ones, like "Homework due", can legitimately repeat)
+DEDUP_MIN_CHARS = 40
+
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+_PAGE_NUMBER_RE = re.compile(r'^(page\s*)?#(\s*(of|/)\s*#)?$|^-\s*#\s*-$')
+_CONTROL_RE = re.compile(r'[\x00-\x08\x0b-\x1f\x7f\u200b\ufeff]')
+
+# --- Token Budget ---
+def _piece_tokens(piece):
+    # Words cost about one token per 4 characters, punctuation one each
+    return (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == '_' else 1
+
+def estimate_tokens(text):
+    """
+    Approximate Gemini token count of a text, computed locally (no API call).
+
+    Args:
+        text (str): The text
+    Returns:
+        int: Estimated number of tokens
+    """
+    return sum(_piece_tokens(match.group()) for match in _TOKEN_RE.finditer(text))
+
+def truncate_to_tokens(text, budget):
+    """
+    Longest prefix of a text that fits a token budget, cut at a line
+    boundary (or a word boundary if the first line alone is over budget).
+
+    Args:
+        text (str): The text
+        budget (int): Most tokens to keep
+    Returns:
+        str: The text, shortened if needed
+    """
+    used = 0
+    kept = []
+    for line in text.split('\n'):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            if not kept:
+                words = []
+                for word in line.split(' '):
+                    used += estimate_tokens(word)
+                    if used > budget:
+                        break
+                    words.append(word)
+                # A single word longer than the budget is cut by characters
+                kept.append(' '.join(words) if words else line[:budget * 4])
+            break
+        kept.append(line)
+        used += cost
+    return '\n'.join(kept)
+
+# --- Normalization ---
+def _clean_line(line):
+    line = _CONTROL_RE.sub('', unicodedata.normalize('NFKC', line))
+    return ' '.join(line.split())
+
+def _edge_key(line):
+    """Compare header/footer candidates ignoring case and page numbers"""
+    return re.sub(r'\d+', '#', line.lower())
+
+def strip_headers_footers(pages):
+    """
+    Remove running headers and footers (lines repeated at the top or bottom
+    of most pages, page numbers included) from a document's pages.
+
+    Args:
+        pages (list): One list of cleaned lines per page
+    Returns:
+        list: The pages without their header and footer lines
+    """
+    def edges(lines):
+        content = [i for i, line in enumerate(lines) if line]
+        return set(content[:HEADER_FOOTER_LINES] + content[-HEADER_FOOTER_LINES:])
+
+    counts = Counter()
+    for lines in pages:
+        counts.update({_edge_key(lines[i]) for i in edges(lines)})
+    threshold = max(2, HEADER_FOOTER_MIN_SHARE * len(pages))
+    repeated = {key for key, count in counts.items() if count >= threshold}
+
+    stripped = []
+    for lines in pages:
+        drop = {i for i in edges(lines)
+                if _edge_key(lines[i]) in repeated or _PAGE_NUMBER_RE.match(_edge_key(lines[i]))}
+        stripped.append([line for i, line in enumerate(lines) if i not in drop])
+    return stripped
+
+def normalize_text(pages):
+    """
+    Join extracted pages into compact prompt text: Unicode normalized
+    (ligatures, full-width forms), whitespace collapsed, headers and footers
+    stripped, words hyphenated across lines rejoined, long repeated lines
+    dropped and blank lines squeezed to one.
+
+    Args:
+        pages (list): Raw text of each page
+    Returns:
+        str: The normalized text
+    """
+    pages = strip_headers_footers([[_clean_line(line) for line in page.splitlines()] for page in pages])
+    lines = []
+    seen = set()
+    for line in (line for page in pages for line in page + ['']):
+        if line and lines and re.search(r'[a-z]-$', lines[-1]) and line[0].islower():
+            lines[-1] = lines[-1][:-1] + line
+            continue
+        if len(line) >= DEDUP_MIN_CHARS:
+            if line in seen:
+                continue
+            seen.add(line)
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return '\n'.join(lines).strip()
+
+# --- Extractors ---
+def extract_pdf_text(filepath):
+    """
+    Extract normalized text from a PDF with pypdf.
+
+    Returns:
+        str: The text, or None if the PDF has (almost) no text layer
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(filepath)
+    if reader.is_encrypted:
+        # Many syllabi are "protected" with an empty user password
+        reader.decrypt('')
+    pages = [page.extract_text() or '' for page in reader.pages]
+    if sum(len(page.strip()) for page in pages) < PDF_MIN_CHARS_PER_PAGE * max(len(pages), 1):
+        return None
+    return normalize_text(pages)
+
+def extract_txt_text(filepath):
+    """Read and normalize a plain text syllabus (UTF-8, else Windows-1252)"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('cp1252', errors='replace')
+    # Form feeds separate pages in text exported from PDFs
+    return normalize_text(text.split('\f'))
+
+def extract_text(filepath, ext):
+    """
+    Local text of a PDF or TXT syllabus. Runs in an extraction worker process.
+
+    Args:
+        filepath (str): Path of the file
+        ext (str): 'pdf' or 'txt'
+    Returns:
+        str: The normalized text ('' if there is none, e.g. a scanned PDF)
+    """
+    text = extract_pdf_text(filepath) if ext == 'pdf' else extract_txt_text(filepath)
+    return text or ''
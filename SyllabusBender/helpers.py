@@ -1,57 +1,342 @@
+import hashlib
+import html
+import json
+import multiprocessing
 import os
+import re
+import secrets
 import sqlite3
-from flask import redirect, session, g
-from functools import wraps
-from google import genai
-from docx import Document
+import threading
+import time
+import zipfile
+import zlib
+from urllib.parse import urlsplit
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import redirect, session, Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from ai_client import AIUnavailableError, create_client, is_retryable
+from extraction import estimate_tokens, extract_text, truncate_to_tokens
+from metrics import record_cache, record_usage, record_validation, span
+from schedule import SCHEDULE_SCHEMA, build_ics, ics_event_text, merge_calendars, parse_schedule
 
 # --- Configuration ---
 UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
 DATABASE = 'database.db'
 
-# Create upload folder if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Largest accepted syllabus upload; bigger files are rejected while streaming
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+
+# Bulk uploads: several files in one request, or a zip of syllabi. The
+# request as a whole may be up to MAX_BATCH_UPLOAD_BYTES; each syllabus
+# (including each one inside a zip) is still limited to MAX_UPLOAD_BYTES.
+ARCHIVE_EXTENSIONS = {'zip'}
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "20"))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+# Leading bytes each file type must start with ('txt' is checked separately)
+FILE_SIGNATURES = {
+    'pdf': (b'%PDF-',),
+    'docx': (b'PK\x03\x04',),
+    'doc': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', b'PK\x03\x04'),
+    'zip': (b'PK\x03\x04', b'PK\x05\x06'),
+}
+MIGRATIONS_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'migrations')
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "16000"))
+# Per-thread connections (see get_db): prepared statements kept per
+# connection, and how long one may sit idle before it's checked on reuse
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "256"))
+SQLITE_HEALTH_CHECK_SECONDS = float(os.getenv("SQLITE_HEALTH_CHECK_SECONDS", "30"))
+
+# Concurrency for the AI pipeline (summary, resources and ICS run in parallel)
+AI_MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", "8"))
+AI_CALL_TIMEOUT = float(os.getenv("AI_CALL_TIMEOUT", "90"))
+# How long a call may wait for a free thread of the (shared) pool before it
+# is given up; its AI_CALL_TIMEOUT only starts once it runs
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "60"))
+ai_executor = ThreadPoolExecutor(max_workers=AI_MAX_WORKERS, thread_name_prefix="ai")
+
+# Gemini model and prompt versions. Bump a prompt's version whenever its text
+# changes so cached results produced by the old prompt are no longer served.
+AI_MODEL = "gemini-2.5-flash"
+PROMPT_VERSIONS = {'validation': 1, 'summary': 1, 'resources': 1, 'schedule': 1}
+
+# Bump when the local text extraction output changes (cached as kind 'text')
+TEXT_EXTRACTOR_VERSION = 2
+
+# PDF/TXT text is extracted in EXTRACT_WORKERS separate processes (pypdf is
+# pure Python and would hold the GIL for the whole parse); 0 extracts in the
+# calling thread. Files whose extraction fails or takes longer than
+# EXTRACT_TIMEOUT seconds are uploaded to Gemini as before.
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "60"))
+
+# Most syllabus text sent with a prompt, in (estimated) tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+VALIDATION_TOKEN_BUDGET = int(os.getenv("VALIDATION_TOKEN_BUDGET", "500"))
+
+# Upper bound for the syllabus result cache (least recently used entries are evicted)
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# A hit only rewrites the entry's last_used once it is this many seconds old,
+# so repeated reads don't each take the database write lock
+CACHE_TOUCH_SECONDS = float(os.getenv("CACHE_TOUCH_SECONDS", "60"))
+
+# Markdown rendering of AI output. Bump RENDERER_VERSION when the output
+# changes so stored HTML is re-rendered on next view.
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'nl2br', 'sane_lists', 'pymdownx.magiclink']
+RENDERER_VERSION = 1
+SAFE_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+# Number of classes listed per page on the dashboard
+CLASSES_PAGE_SIZE = int(os.getenv("CLASSES_PAGE_SIZE", "50"))
+
+# Storage of summary, resources, resources_html and ics in the results table
+# (0 = plain, 1 = gzip). Rows in an older format are converted in the
+# background, STORAGE_MIGRATION_BATCH rows per transaction.
+RESULT_STORAGE_FORMAT = 1
+RESULT_COMPRESSION_LEVEL = int(os.getenv("RESULT_COMPRESSION_LEVEL", "6"))
+STORAGE_MIGRATION_BATCH = int(os.getenv("STORAGE_MIGRATION_BATCH", "200"))
+
+# Full-text search over saved classes (/search). Results saved before the
+# index existed are indexed in the background, SEARCH_INDEX_BATCH at a time.
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_SNIPPET_TOKENS = 16
+SEARCH_MAX_TERMS = 12
+SEARCH_INDEX_BATCH = int(os.getenv("SEARCH_INDEX_BATCH", "200"))
 
-# Initialize Gemini API client
-api_key = os.getenv("GEMINI_API_KEY")
-try:
-    client = genai.Client(api_key=api_key)
-    print("Gemini client initialized successfully.")
-except Exception as e:
-    print(f"Error initializing Gemini client: {e}")
-    client = None
+# Merged per-user calendar feeds kept in memory (most recently used users)
+CALENDAR_FEED_CACHE_SIZE = int(os.getenv("CALENDAR_FEED_CACHE_SIZE", "256"))
+_calendar_feed_cache = OrderedDict()
+_calendar_feed_lock = threading.Lock()
+
+# Local syllabus pre-filter: documents scoring at or above ACCEPT are accepted
+# and those at or below REJECT with no syllabus keyword at all are rejected
+# without calling Gemini; anything in between (or with no local text, e.g.
+# scanned PDFs) goes to the LLM. Keywords match whole words only.
+PREFILTER_BYTES = int(os.getenv("PREFILTER_BYTES", str(8 * 1024)))
+PREFILTER_ACCEPT_SCORE = int(os.getenv("PREFILTER_ACCEPT_SCORE", "6"))
+PREFILTER_REJECT_SCORE = int(os.getenv("PREFILTER_REJECT_SCORE", "-3"))
+
+SYLLABUS_KEYWORDS = (
+    'syllabus', 'course description', 'course objectives', 'learning outcomes',
+    'instructor', 'office hours', 'prerequisite', 'textbook', 'required reading',
+    'grading', 'attendance', 'midterm', 'final exam', 'assignments', 'homework',
+    'credit hours', 'lecture', 'semester', 'course schedule', 'academic integrity',
+    'teaching assistant', 'course policies', 'week 1'
+)
+# Only phrases a syllabus wouldn't use; words like "resume", "slides" or
+# "questions?" are common in syllabi too
+NON_SYLLABUS_KEYWORDS = (
+    'curriculum vitae', 'work experience', 'professional experience',
+    'employment history', 'references available', 'career objective',
+    'invoice', 'purchase order', 'dear sir', 'dear hiring', 'thank you for your time'
+)
+
+# Gemini API client (rate limited, with retries and a circuit breaker; see
+# ai_client.py). Created on first use by get_client(), so processes that
+# only serve pages never import google-genai. Tests and benchmarks can
+# assign a client here directly.
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the Gemini client, creating it on first use"""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                try:
+                    client = create_client(os.getenv("GEMINI_API_KEY"))
+                    print("Gemini client initialized successfully.")
+                except Exception as e:
+                    print(f"Error initializing Gemini client: {e}")
+                    raise
+    return client
+
+def _client_ready():
+    """True if the Gemini client exists or could be created now"""
+    try:
+        return get_client() is not None
+    except Exception:
+        return False
 
 # --- Database Functions ---
+def _migrations():
+    """Yield (version, name, sql) for each migration file, in order"""
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql'):
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), 'r') as f:
+            yield int(filename.split('_', 1)[0]), filename, f.read()
+
+def _sql_statements(sql):
+    """Split a SQL script into complete statements (triggers included)"""
+    statement = ''
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement.strip()
+            statement = ''
+    if statement.strip() and not all(
+        l.strip().startswith('--') or not l.strip() for l in statement.splitlines()
+    ):
+        yield statement.strip()
+
 def init_db():
-    """Initialize database with schema if it doesn't exist"""
-    if os.path.exists(DATABASE):
-        return
-        
-    print("Database not found. Creating database...")
-    conn = sqlite3.connect(DATABASE)
-    
-    schema_file = os.path.join(os.path.dirname(__file__), 'schema.sql')
-    if os.path.exists(schema_file):
-        with open(schema_file, 'r') as f:
-            conn.executescript(f.read())
-        conn.commit()
-        print("Database created successfully!")
-    else:
-        print(f"Warning: Schema file not found at {schema_file}")
-    
-    conn.close()
+    """
+    Create the database if needed and apply pending migrations.
+
+    The schema version is kept in PRAGMA user_version. Each migration runs
+    in its own IMMEDIATE transaction and re-checks the version once it holds
+    the write lock, so several worker processes can start at the same time.
+    Migrations whose first line is '-- no-transaction' (e.g. journal mode
+    changes) run outside a transaction and must be idempotent.
+    """
+    if not os.path.exists(DATABASE):
+        print("Database not found. Creating database...")
+    conn = sqlite3.connect(DATABASE, isolation_level=None)
+    _register_functions(conn)
+    try:
+        for version, name, sql in _migrations():
+            if sql.startswith('-- no-transaction'):
+                if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+                    continue
+                print(f"Applying migration {name}...")
+                for statement in _sql_statements(sql):
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                continue
+
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+                conn.execute('ROLLBACK')
+                continue
+            print(f"Applying migration {name}...")
+            try:
+                # executescript() would commit early, so run statement by statement
+                for statement in _sql_statements(sql):
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        print("Database schema is up to date.")
+    finally:
+        conn.close()
+
+# This thread's connection and its bookkeeping (pid, path, last use, transaction depth)
+_connections = threading.local()
+
+def _register_functions(db):
+    """SQL functions the schema relies on (the search index's content view)"""
+    db.create_function('result_text', 2, _result_text, deterministic=True)
+    db.create_function('result_events', 2, _result_events, deterministic=True)
+
+def _connect():
+    db = sqlite3.connect(DATABASE, cached_statements=SQLITE_CACHED_STATEMENTS)
+    db.row_factory = sqlite3.Row
+    _register_functions(db)
+    db.execute("PRAGMA foreign_keys = ON")
+    # WAL (see migrations) only needs fsync at checkpoints; 16 MB page cache
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_KB}")
+    return db
+
+def _healthy(db):
+    try:
+        db.execute('SELECT 1').fetchone()
+        return True
+    except sqlite3.Error:
+        return False
 
 def get_db():
-    """Get database connection"""
-    db = getattr(g, '_database', None)
+    """
+    Get this thread's database connection.
+
+    Connections are opened once per thread and reused by every request and
+    job that thread handles, keeping their prepared statement cache warm.
+    One idle for more than SQLITE_HEALTH_CHECK_SECONDS is checked before
+    reuse and replaced if broken; a forked process never reuses its parent's.
+    """
+    state = _connections.__dict__
+    db = state.get('db')
+    now = time.monotonic()
+    if db is not None:
+        if state['pid'] != os.getpid():
+            # Inherited across fork: leave it to the parent
+            db = None
+        elif state['path'] != DATABASE or (
+            now - state['used_at'] > SQLITE_HEALTH_CHECK_SECONDS and not _healthy(db)
+        ):
+            db.close()
+            db = None
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
-        db.execute("PRAGMA foreign_keys = ON")
+        db = _connect()
+        state.update(db=db, pid=os.getpid(), path=DATABASE, depth=0)
+    state['used_at'] = now
     return db
 
+def release_db(exception=None):
+    """
+    Hand this thread's connection back at the end of a request or job
+    (teardown_appcontext). It stays open; anything left uncommitted, e.g.
+    after an error, is rolled back so the next user starts clean.
+    """
+    state = _connections.__dict__
+    db = state.get('db')
+    if db is not None and state['pid'] == os.getpid() and db.in_transaction:
+        db.rollback()
+    state['depth'] = 0
+
+@contextmanager
+def transaction():
+    """
+    Unit of work: the writes inside commit together, once, at the end, or
+    roll back together if it raises. It starts with BEGIN IMMEDIATE, so what
+    is read inside can't change before it is written. execute_db() calls
+    inside don't commit on their own. A nested transaction() block is a
+    SAVEPOINT in the outermost one: if it raises, only its own writes are
+    rolled back, so a caller that catches the error commits nothing of it.
+
+        with transaction() as db:
+            ...
+    """
+    db = get_db()
+    state = _connections.__dict__
+    if state['depth']:
+        savepoint = f"tx{state['depth']}"
+        db.execute(f'SAVEPOINT {savepoint}')
+        state['depth'] += 1
+        try:
+            yield db
+        except BaseException:
+            db.execute(f'ROLLBACK TO {savepoint}')
+            raise
+        finally:
+            state['depth'] -= 1
+            db.execute(f'RELEASE {savepoint}')
+        return
+
+    db.execute('BEGIN IMMEDIATE')
+    state['depth'] = 1
+    try:
+        yield db
+    except BaseException:
+        db.rollback()
+        raise
+    else:
+        with span('db_commit'):
+            db.commit()
+    finally:
+        state['depth'] = 0
+
 def query_db(query, args=(), one=False):
     """Execute a query and return results"""
     cur = get_db().execute(query, args)
@@ -60,17 +345,114 @@ def query_db(query, args=(), one=False):
     return (rv[0] if rv else None) if one else rv
 
 def execute_db(query, args=()):
-    """Execute a query that modifies the database"""
+    """Execute a query that modifies the database (committed now, unless inside transaction())"""
     db = get_db()
-    cur = db.execute(query, args)
-    db.commit()
+    with span('db_write'):
+        cur = db.execute(query, args)
+        if not _connections.depth:
+            db.commit()
     lastrowid = cur.lastrowid
     cur.close()
     return lastrowid
 
-def add_syllabus_result(user_id, name, summary, resources, semester_start_date=None, semester_end_date=None):
+# --- Result Storage ---
+def pack_result_field(value, storage_format=RESULT_STORAGE_FORMAT):
+    """
+    Encode a summary/resources/resources_html/ics value for storage.
+
+    Args:
+        value (str | bytes): The value (None is stored as is)
+        storage_format (int, optional): 0 = plain, 1 = gzip
+    Returns:
+        str | bytes: The value to write to the results table
+    """
+    if value is None or storage_format == 0:
+        return value
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    # gzip framing (wbits 31) so ICS blobs can be sent with Content-Encoding: gzip as stored
+    compressor = zlib.compressobj(RESULT_COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(value) + compressor.flush()
+
+def unpack_result_field(value, storage_format, binary=False):
+    """
+    Decode a value written by pack_result_field.
+
+    Args:
+        value (str | bytes): The stored value
+        storage_format (int): The row's storage_format
+        binary (bool, optional): Return bytes (ICS) instead of text
+    Returns:
+        str | bytes: The original value, or None
+    """
+    if value is None:
+        return None
+    if storage_format:
+        value = zlib.decompress(value, 31)
+    if binary:
+        return value.encode('utf-8') if isinstance(value, str) else value
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+def _result_text(value, storage_format):
+    """SQL result_text(): a stored summary/resources as plain text ('' for NULL)"""
+    return unpack_result_field(value, storage_format) or ''
+
+def _result_events(ics, storage_format):
+    """SQL result_events(): the searchable event text of a stored calendar"""
+    ics = unpack_result_field(ics, storage_format, binary=True)
+    return ics_event_text(ics) if ics else ''
+
+def compress_legacy_results(batch_size=STORAGE_MIGRATION_BATCH):
+    """
+    Convert one batch of results still stored in the legacy plain format
+    (0) to RESULT_STORAGE_FORMAT.
+
+    The batch is read and rewritten inside one IMMEDIATE transaction, so no
+    other writer can change those rows in between.
+
+    Returns:
+        int: Number of rows converted (0 once everything is current)
+    """
+    with transaction() as db:
+        rows = db.execute(
+            # Written like idx_results_legacy_storage's WHERE (a literal) so the planner uses it
+            '''SELECT id, summary, resources, resources_html, ics, storage_format FROM results
+               WHERE storage_format = 0 ORDER BY id LIMIT ?''',
+            [batch_size]
+        ).fetchall()
+        db.executemany(
+            '''UPDATE results SET summary = ?, resources = ?, resources_html = ?, ics = ?, storage_format = ?
+               WHERE id = ?''',
+            [(
+                pack_result_field(unpack_result_field(row['summary'], row['storage_format'])),
+                pack_result_field(unpack_result_field(row['resources'], row['storage_format'])),
+                pack_result_field(unpack_result_field(row['resources_html'], row['storage_format'])),
+                pack_result_field(unpack_result_field(row['ics'], row['storage_format'], binary=True)),
+                RESULT_STORAGE_FORMAT,
+                row['id']
+            ) for row in rows]
+        )
+    return len(rows)
+
+def _result_row(user_id, name, summary, resources, semester_start_date=None, semester_end_date=None,
+                schedule=None, ics=None):
+    """Column values for one new results row (rendered and packed for storage)"""
+    from datetime import datetime
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    resources_html = render_markdown(resources)
+    return [user_id, name, pack_result_field(summary), pack_result_field(resources),
+            pack_result_field(resources_html), RENDERER_VERSION,
+            semester_start_date, semester_end_date, current_date, schedule, pack_result_field(ics),
+            RESULT_STORAGE_FORMAT]
+
+_RESULT_COLUMNS = '''user_id, name, summary, resources, resources_html, html_version,
+                     semester_start_date, semester_end_date, "current_date", schedule, ics, storage_format'''
+
+def add_syllabus_result(user_id, name, summary, resources, semester_start_date=None, semester_end_date=None,
+                        schedule=None, ics=None):
     """
-    Store processed syllabus data in the results table.
+    Store processed syllabus data in the results table, together with the
+    pre-rendered HTML of the resources, compressed per RESULT_STORAGE_FORMAT.
     
     Args:
         user_id (int): The ID of the user
@@ -79,42 +461,648 @@ def add_syllabus_result(user_id, name, summary, resources, semester_start_date=N
         resources (str): AI-generated resources in markdown format
         semester_start_date (str, optional): Start date of semester (YYYY-MM-DD)
         semester_end_date (str, optional): End date of semester (YYYY-MM-DD)
+        schedule (str, optional): Extracted schedule JSON, used to rebuild the calendar
+        ics (bytes, optional): The calendar built from the schedule
     
     Returns:
         int: The ID of the inserted record
     """
     try:
-        from datetime import datetime
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        
-        result_id = execute_db(
-            '''INSERT INTO results 
-               (user_id, name, summary, resources, semester_start_date, semester_end_date, current_date) 
-               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-            [user_id, name, summary, resources, semester_start_date, semester_end_date, current_date]
-        )
+        row = _result_row(user_id, name, summary, resources, semester_start_date, semester_end_date, schedule, ics)
+        # Searchable together with the row itself
+        with transaction():
+            result_id = execute_db(
+                f'INSERT INTO results ({_RESULT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row
+            )
+            index_results([result_id])
         print(f"Syllabus result added to database with ID: {result_id}")
         return result_id
     except Exception as e:
         print(f"Error adding syllabus result to database: {e}")
         return None
 
-def get_user_results(user_id):
+def add_syllabus_results(results):
     """
-    Retrieve all processed syllabus results for a user from the database.
+    Insert several results (and their search index entries) with one
+    executemany each, in one transaction (or as part of the caller's
+    transaction()). The IDs are assigned up front from
+    the AUTOINCREMENT sequence, which nobody else can advance meanwhile.
+
+    Args:
+        results (list): dicts with the keyword arguments of add_syllabus_result
+    Returns:
+        list: The new result IDs, in the order of `results`
+    """
+    rows = [_result_row(**result) for result in results]
+    with transaction() as db:
+        last_id = db.execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'results'), 0)"
+        ).fetchone()[0]
+        result_ids = list(range(last_id + 1, last_id + 1 + len(rows)))
+        with span('db_write', rows=len(rows)):
+            db.executemany(
+                f'INSERT INTO results (id, {_RESULT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [[result_id] + row for result_id, row in zip(result_ids, rows)]
+            )
+        index_results(result_ids)
+    print(f"Syllabus results added to database with IDs: {result_ids}")
+    return result_ids
+
+def get_user_results(user_id, limit=CLASSES_PAGE_SIZE, before=None):
+    """
+    Retrieve one page of a user's processed syllabus results, newest first.
+
+    Only the columns needed for listings are read; the summary, resources and
+    ICS blob stay in the database until a single class is opened.
     
     Args:
         user_id (int): The ID of the user
+        limit (int, optional): Maximum number of results to return
+        before (str, optional): Cursor from a previous page ("YYYY-MM-DD:id")
     Returns:
-        list: List of result entries for the user, or empty list if none exist
+        tuple: (list of result entries, cursor for the next page or None)
     """
     try:
-        rows = query_db('SELECT * FROM results WHERE user_id = ? ORDER BY current_date DESC', [user_id])
-        return [dict(row) for row in rows]
+        args = [user_id]
+        keyset = ''
+        if before:
+            before_date, before_id = before.rsplit(':', 1)
+            keyset = 'AND ("current_date", id) < (?, ?)'
+            args += [before_date, int(before_id)]
+        rows = query_db(
+            f'''SELECT id, name, semester_start_date, semester_end_date, "current_date",
+                      ics IS NOT NULL AS has_ics
+               FROM results
+               WHERE user_id = ? {keyset}
+               ORDER BY "current_date" DESC, id DESC
+               LIMIT ?''',
+            args + [limit + 1]
+        )
+        results = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = results[-1]
+            next_cursor = f"{last['current_date']}:{last['id']}"
+        return results, next_cursor
     except Exception as e:
         print(f"Error retrieving results: {e}")
-        return []
+        return [], None
+
+def get_latest_semester_dates(user_id):
+    """
+    Semester dates of a user's most recent result.
+
+    Returns:
+        tuple: (semester_start_date, semester_end_date), (None, None) if none exist
+    """
+    row = query_db(
+        '''SELECT semester_start_date, semester_end_date FROM results
+           WHERE user_id = ? ORDER BY "current_date" DESC, id DESC LIMIT 1''',
+        [user_id], one=True
+    )
+    if row is None:
+        return None, None
+    return row['semester_start_date'], row['semester_end_date']
+    
+def _parse_semester_dates(semester_start_date, semester_end_date):
+    """Validate a pair of YYYY-MM-DD semester dates, raising ValueError if unusable"""
+    from datetime import date
+    try:
+        start = date.fromisoformat(semester_start_date or '')
+        end = date.fromisoformat(semester_end_date or '')
+    except ValueError:
+        raise ValueError("Semester dates must be valid YYYY-MM-DD dates")
+    if end < start:
+        raise ValueError("Semester end date must not be before the start date")
+    return start.isoformat(), end.isoformat()
+
+def rebuild_calendars(user_id, semester_start_date, semester_end_date, result_ids=None):
+    """
+    Move results to new semester dates and rebuild their calendars locally
+    from the stored schedules (no file or LLM call needed).
+
+    All rows are updated in one transaction. Results saved before schedules
+    were stored have nothing to rebuild from and are left unchanged.
+
+    Args:
+        user_id (int): The ID of the user
+        semester_start_date (str): New start date of semester (YYYY-MM-DD)
+        semester_end_date (str): New end date of semester (YYYY-MM-DD)
+        result_ids (list, optional): Only these results (default: all of the user's)
+    Returns:
+        tuple: (number of results updated, number skipped for lack of a schedule)
+    Raises:
+        ValueError: If the dates are invalid
+    """
+    start, end = _parse_semester_dates(semester_start_date, semester_end_date)
+    query = 'SELECT id, name, schedule, storage_format FROM results WHERE user_id = ?'
+    args = [user_id]
+    if result_ids is not None:
+        if not result_ids:
+            return 0, 0
+        query += f" AND id IN ({', '.join('?' * len(result_ids))})"
+        args += list(result_ids)
+
+    updates = []
+    skipped = 0
+    # Read and write under one lock so the rows' storage format can't change in between
+    with transaction() as db:
+        for row in db.execute(query, args).fetchall():
+            if not row['schedule']:
+                skipped += 1
+                continue
+            ics = build_ics(json.loads(row['schedule']), row['name'], start, end)
+            updates.append((start, end, pack_result_field(ics, row['storage_format']), row['id']))
+        # The search index's events follow through the results_search triggers
+        db.executemany(
+            'UPDATE results SET semester_start_date = ?, semester_end_date = ?, ics = ? WHERE id = ?',
+            updates
+        )
+    print(f"[CALENDAR] Rebuilt {len(updates)} calendar(s) for {start} to {end}, skipped {skipped}.")
+    return len(updates), skipped
+
+def get_calendar_token(user_id):
+    """Return the secret token of a user's calendar feed URL, creating it on first use"""
+    row = query_db('SELECT calendar_token FROM users WHERE id = ?', [user_id], one=True)
+    if row is None:
+        return None
+    if row['calendar_token']:
+        return row['calendar_token']
+    token = secrets.token_urlsafe(24)
+    # Another request may have created one meanwhile; keep whichever was first
+    execute_db('UPDATE users SET calendar_token = ? WHERE id = ? AND calendar_token IS NULL', [token, user_id])
+    return query_db('SELECT calendar_token FROM users WHERE id = ?', [user_id], one=True)['calendar_token']
+
+def get_calendar_feed_user(token):
+    """Return the ID of the user a calendar feed token belongs to, or None"""
+    if not token:
+        return None
+    row = query_db('SELECT id FROM users WHERE calendar_token = ?', [token], one=True)
+    return row['id'] if row else None
+
+def calendar_feed_version(user_id):
+    """
+    Cheap validator for a user's merged calendar, read without loading any ICS.
+
+    It changes whenever a calendar is added or rebuilt (results.updated_at is
+    maintained by triggers), so it serves as ETag and cache key.
+
+    Returns:
+        tuple: (etag, last modified as Unix time or None if the user has no calendars)
+    """
+    row = query_db(
+        '''SELECT COUNT(*) AS count, MAX(id) AS max_id, MAX(updated_at) AS updated_at
+           FROM results WHERE user_id = ? AND ics IS NOT NULL''',
+        [user_id], one=True
+    )
+    key = f"{user_id}:{row['count']}:{row['max_id']}:{row['updated_at']}"
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+    return etag, row['updated_at']
+
+def get_calendar_feed(user_id, etag, calendar_name="Syllabus Bender"):
+    """
+    Merge every calendar of a user into one ICS file, reusing the last merge
+    while the feed's version (see calendar_feed_version) is unchanged.
+
+    Args:
+        user_id (int): The ID of the user
+        etag (str): Current version from calendar_feed_version()
+        calendar_name (str, optional): Name shown by calendar apps
+    Returns:
+        bytes: UTF-8 encoded ICS content
+    """
+    with _calendar_feed_lock:
+        cached = _calendar_feed_cache.get(user_id)
+        if cached is not None and cached[0] == etag:
+            _calendar_feed_cache.move_to_end(user_id)
+            return cached[1]
+
+    rows = query_db(
+        'SELECT id, ics, storage_format FROM results WHERE user_id = ? AND ics IS NOT NULL ORDER BY id',
+        [user_id]
+    )
+    feed = merge_calendars(
+        [(row['id'], unpack_result_field(row['ics'], row['storage_format'], binary=True)) for row in rows],
+        calendar_name
+    )
+    print(f"[CALENDAR] Merged {len(rows)} calendar(s) for user {user_id}.")
+
+    with _calendar_feed_lock:
+        _calendar_feed_cache[user_id] = (etag, feed)
+        _calendar_feed_cache.move_to_end(user_id)
+        while len(_calendar_feed_cache) > CALENDAR_FEED_CACHE_SIZE:
+            _calendar_feed_cache.popitem(last=False)
+    return feed
+
+def _cache_version(kind):
+    if kind == 'text':
+        return f"text:{TEXT_EXTRACTOR_VERSION}"
+    return f"{AI_MODEL}:{PROMPT_VERSIONS[kind]}"
+
+def cache_get(file_hash, kind, params=''):
+    """
+    Look up a cached AI result for a syllabus.
+
+    Args:
+        file_hash (str): SHA-256 of the uploaded syllabus bytes
+        kind (str): One of 'validation', 'summary', 'resources', 'schedule', 'text'
+        params (str, optional): Extra key material
+    Returns:
+        bytes: The cached value, or None on a miss
+    """
+    try:
+        key = [file_hash, _cache_version(kind), kind, params]
+        row = query_db(
+            '''SELECT value, last_used FROM syllabus_cache
+               WHERE file_hash = ? AND version = ? AND kind = ? AND params = ?''',
+            key, one=True
+        )
+        record_cache(kind, row is not None)
+        if row is None:
+            return None
+        now = time.time()
+        if now - row['last_used'] > CACHE_TOUCH_SECONDS:
+            execute_db(
+                '''UPDATE syllabus_cache SET last_used = ?
+                   WHERE file_hash = ? AND version = ? AND kind = ? AND params = ?''',
+                [now] + key
+            )
+        return bytes(row['value'])
+    except Exception as e:
+        print(f"Error reading syllabus cache: {e}")
+        return None
+
+def cache_put(file_hash, kind, value, params=''):
+    """
+    Store an AI result for a syllabus and evict least recently used entries
+    once the cache grows past CACHE_MAX_BYTES.
+
+    Args:
+        file_hash (str): SHA-256 of the uploaded syllabus bytes
+        kind (str): One of 'validation', 'summary', 'resources', 'schedule', 'text'
+        value (bytes): The result to cache
+        params (str, optional): Extra key material
+    """
+    try:
+        with transaction() as db:
+            db.execute(
+                '''INSERT OR REPLACE INTO syllabus_cache
+                   (file_hash, version, kind, params, value, size, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                [file_hash, _cache_version(kind), kind, params, value, len(value), time.time()]
+            )
+            # The ranked eviction only runs once the cache is actually over the limit
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM syllabus_cache').fetchone()[0]
+            if total > CACHE_MAX_BYTES:
+                db.execute(
+                    '''DELETE FROM syllabus_cache WHERE rowid IN (
+                         SELECT rowid FROM (
+                           SELECT rowid, SUM(size) OVER (ORDER BY last_used DESC, rowid DESC) AS running
+                           FROM syllabus_cache
+                         ) WHERE running > ?
+                       )''',
+                    [CACHE_MAX_BYTES]
+                )
+    except Exception as e:
+        print(f"Error writing syllabus cache: {e}")
+
+def invalidate_cache(kind=None, stale_only=False):
+    """
+    Remove cached AI results.
+
+    Args:
+        kind (str, optional): Only touch entries of this kind (default: all kinds)
+        stale_only (bool): Only remove entries whose model/prompt version is
+                           no longer current (e.g. after bumping PROMPT_VERSIONS)
+    Returns:
+        int: Number of removed entries
+    """
+    kinds = [kind] if kind else list(PROMPT_VERSIONS) + ['text']
+    removed = 0
+    with transaction() as db:
+        for k in kinds:
+            if stale_only:
+                cur = db.execute(
+                    'DELETE FROM syllabus_cache WHERE kind = ? AND version != ?', [k, _cache_version(k)]
+                )
+            else:
+                cur = db.execute('DELETE FROM syllabus_cache WHERE kind = ?', [k])
+            removed += cur.rowcount
+    return removed
     
+def get_result_for_view(result_id, user_id):
+    """
+    Load a result for display, serving the stored resources HTML.
+
+    Rows saved before pre-rendering (or by an older renderer) are rendered
+    once here and written back, so later views skip the markdown parser.
+
+    Returns:
+        dict: The result (without the ICS blob, with 'has_ics' and 'has_schedule'), or None
+    """
+    row = query_db(
+        '''SELECT id, name, summary, resources, resources_html, html_version, storage_format,
+                  semester_start_date, semester_end_date, ics IS NOT NULL AS has_ics,
+                  schedule IS NOT NULL AS has_schedule
+           FROM results WHERE id = ? AND user_id = ?''',
+        [result_id, user_id], one=True
+    )
+    if row is None:
+        return None
+    result = dict(row)
+    for field in ('summary', 'resources', 'resources_html'):
+        result[field] = unpack_result_field(result[field], result['storage_format'])
+    if result['html_version'] != RENDERER_VERSION:
+        result['resources_html'] = render_markdown(result['resources'])
+        # Skipped if the row was converted to a new storage format meanwhile; a later view retries
+        execute_db(
+            'UPDATE results SET resources_html = ?, html_version = ? WHERE id = ? AND storage_format = ?',
+            [pack_result_field(result['resources_html'], result['storage_format']), RENDERER_VERSION,
+             result_id, result['storage_format']]
+        )
+    return result
+
+# --- Search ---
+def index_results(result_ids):
+    """
+    Add saved results to the search index, in the current transaction() if
+    there is one. The text is read back (unpacked) through the index's
+    content view, so it is exactly what the index later removes; results
+    already indexed are skipped.
+
+    Args:
+        result_ids (list): IDs of the results
+    """
+    with transaction() as db:
+        db.executemany(
+            '''INSERT INTO results_search (rowid, owner, name, summary, resources, events)
+               SELECT id, owner, name, summary, resources, events FROM results_search_source
+               WHERE id = ? AND NOT EXISTS (SELECT 1 FROM results_search_docsize WHERE id = ?)''',
+            [[result_id, result_id] for result_id in result_ids]
+        )
+
+def index_unindexed_results(after_id=0, batch_size=SEARCH_INDEX_BATCH):
+    """
+    Index one batch of results that aren't in the search index yet (saved
+    before it existed), in id order.
+
+    Args:
+        after_id (int, optional): Only look at results with a larger ID
+        batch_size (int, optional): Most results to index in this call
+    Returns:
+        tuple: (number indexed, ID to continue after); 0 when done
+    """
+    with transaction() as db:
+        # results_search_docsize has a row per indexed result
+        result_ids = [row['id'] for row in db.execute(
+            '''SELECT id FROM results r
+               WHERE id > ? AND NOT EXISTS (SELECT 1 FROM results_search_docsize s WHERE s.id = r.id)
+               ORDER BY id LIMIT ?''',
+            [after_id, batch_size]
+        ).fetchall()]
+        index_results(result_ids)
+    return len(result_ids), result_ids[-1] if result_ids else after_id
+
+def _fts_query(text):
+    """
+    Turn what the user typed into an FTS5 query: every word must match
+    (the last one as a prefix, for partial words). Quotes keep FTS5 syntax
+    in the input from being interpreted.
+    """
+    terms = re.findall(r'\w+', text)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+# Snippet markers, swapped for <mark> after the text around them is escaped
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+
+def _snippet_html(text):
+    return html.escape(text).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+def search_results(user_id, text, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Full-text search over a user's saved classes, best matches first.
+
+    Class names weigh most, then calendar events, summaries and resources.
+    Each hit carries the snippet of the field with the most matches, or the
+    start of the summary when only the name matched. Snippets are built
+    from the unpacked rows of the page's hits (see migration 0013).
+
+    Args:
+        user_id (int): The ID of the user
+        text (str): What the user typed
+        page (int, optional): 1-based page number
+        page_size (int, optional): Hits per page
+    Returns:
+        tuple: (list of dicts with id, name, current_date, field and
+                snippet_html; whether there is a next page)
+    """
+    query = _fts_query(text)
+    if query is None:
+        return [], False
+    snippets = ', '.join(
+        f"snippet(results_search, {column}, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SEARCH_SNIPPET_TOKENS})"
+        f" AS {name}" for column, name in ((2, 'summary'), (3, 'resources'), (4, 'events'))
+    )
+    with span('search', page=page):
+        rows = query_db(
+            f'''SELECT s.rowid AS id, r.name, r."current_date", {snippets}
+                FROM results_search s JOIN results r ON r.id = s.rowid
+                WHERE results_search MATCH ?
+                ORDER BY bm25(results_search, 0.0, 10.0, 2.0, 1.0, 4.0)
+                LIMIT ? OFFSET ?''',
+            [f'owner:"u{user_id}" AND ({query})', page_size + 1, (page - 1) * page_size]
+        )
+    hits = []
+    for row in rows[:page_size]:
+        # Field whose snippet highlights the most terms (ties: events, summary, resources)
+        field = max(('events', 'summary', 'resources'), key=lambda name: (row[name] or '').count(_MARK_OPEN))
+        if _MARK_OPEN not in (row[field] or ''):
+            # Only the name matched; a column without matches snippets its start
+            field = 'summary'
+        hits.append({
+            'id': row['id'],
+            'name': row['name'],
+            'current_date': row['current_date'],
+            'field': field,
+            'snippet_html': _snippet_html(row[field] or '')
+        })
+    return hits, len(rows) > page_size
+
+# --- Upload Ingestion ---
+def _signature_matches(ext, head):
+    """Check a file's first bytes against what its extension promises"""
+    if ext == 'txt':
+        # Plain text: no NUL bytes and not one of the binary formats above
+        return b'\x00' not in head and not any(
+            head.startswith(sig) for sigs in FILE_SIGNATURES.values() for sig in sigs
+        )
+    return any(head.startswith(sig) for sig in FILE_SIGNATURES[ext])
+
+class UploadStream:
+    """
+    Writable stream the multipart parser fills with an uploaded syllabus.
+
+    Bytes go straight to their final path in the uploads folder while their
+    SHA-256 is computed, and the upload is aborted (and the partial file
+    removed) as soon as it exceeds MAX_UPLOAD_BYTES or its leading bytes
+    don't match its extension. Call commit() to keep the file; otherwise
+    it is deleted when the request closes it.
+    """
+
+    SNIFF_BYTES = 8
+
+    def __init__(self, filename, max_bytes=MAX_UPLOAD_BYTES):
+        self.ext = filename.rsplit('.', 1)[1].lower()
+        self.path = new_upload_path(filename)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha = hashlib.sha256()
+        self.head = b''
+        self.committed = False
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(f"File is too large (max {self.max_bytes // (1024 * 1024)} MB).")
+        if len(self.head) < self.SNIFF_BYTES:
+            self.head += data[:self.SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= self.SNIFF_BYTES and not _signature_matches(self.ext, self.head):
+                self.discard()
+                raise UnsupportedMediaType(f"File content does not match its .{self.ext} extension.")
+        self.sha.update(data)
+        return self._file.write(data)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def commit(self):
+        """
+        Keep the uploaded file.
+
+        Returns:
+            tuple: (path, SHA-256 hex digest)
+        """
+        if len(self.head) < self.SNIFF_BYTES and not _signature_matches(self.ext, self.head):
+            self.discard()
+            raise UnsupportedMediaType(f"File content does not match its .{self.ext} extension.")
+        self._file.close()
+        self.committed = True
+        return self.path, self.sha.hexdigest()
+
+    def discard(self):
+        """Close and delete the partially written file"""
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if not self.committed:
+            self.discard()
+
+def extract_upload_archive(archive_path, max_files=MAX_BATCH_FILES):
+    """
+    Unpack the syllabi in an uploaded zip into the uploads folder, hashing
+    them as they are written, then delete the archive.
+
+    Members with other extensions, folders and hidden/metadata files
+    (e.g. __MACOSX) are skipped. Each member gets the same size and
+    content-signature checks as a direct upload.
+
+    Args:
+        archive_path (str): Path of the committed zip upload
+        max_files (int, optional): Most syllabi to accept from one archive
+    Returns:
+        list: (original filename, path, SHA-256 hex digest) per syllabus
+    Raises:
+        UnsupportedMediaType: If the archive is unreadable or holds no usable syllabus
+        RequestEntityTooLarge: If a member is too large or there are too many
+    """
+    extracted = []
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir() and allowed_file(info.filename)
+                and not any(part.startswith(('.', '__MACOSX')) for part in info.filename.split('/'))
+            ]
+            if len(members) > max_files:
+                raise RequestEntityTooLarge(f"Too many files in the archive (max {max_files}).")
+            for info in members:
+                filename = os.path.basename(info.filename)
+                stream = UploadStream(filename)
+                try:
+                    with archive.open(info) as member:
+                        # Read in chunks; the stream enforces the size limit whatever the header claims
+                        while chunk := member.read(64 * 1024):
+                            stream.write(chunk)
+                    path, file_hash = stream.commit()
+                except UnsupportedMediaType:
+                    print(f"[UPLOAD] Skipping {filename}: content does not match its extension")
+                    continue
+                finally:
+                    stream.close()
+                extracted.append((filename, path, file_hash))
+    except zipfile.BadZipFile:
+        raise UnsupportedMediaType("The archive could not be read.")
+    except Exception:
+        # Don't leave half an archive behind in the uploads folder
+        for _, path, _ in extracted:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    finally:
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+    if not extracted:
+        raise UnsupportedMediaType("The archive contains no syllabus files (PDF, DOC, DOCX or TXT).")
+    return extracted
+
+class UploadRequest(Request):
+    """
+    Request class that ingests allowed uploads through UploadStream.
+
+    Every stream opened for the request is tracked, and the files the view
+    didn't commit are deleted when the request is closed. That includes the
+    earlier files of a multi-file upload whose parsing was aborted by a
+    later file (too large or wrong content), which the parser drops.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_streams = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if not allowed_file(filename):
+            # Rejected before any of the file body is read (zips of syllabi are unpacked later)
+            if not is_archive(filename):
+                raise UnsupportedMediaType("File type not allowed.")
+            stream = UploadStream(filename, max_bytes=MAX_BATCH_UPLOAD_BYTES)
+        else:
+            stream = UploadStream(filename)
+        self.upload_streams.append(stream)
+        return stream
+
+    def close(self):
+        for stream in self.upload_streams:
+            stream.close()
+        super().close()
+
 # --- Decorators ---
 def login_required(f):
     @wraps(f)
@@ -125,130 +1113,392 @@ def login_required(f):
     return decorated_function
 
 # --- Helper Functions ---
+def _new_markdown():
+    """
+    A Markdown instance that escapes raw HTML in the source and drops
+    link/image URLs with schemes other than SAFE_URL_SCHEMES (e.g.
+    javascript:). markdown is imported here, on first render.
+    """
+    import markdown
+    from markdown.extensions import Extension
+    from markdown.treeprocessors import Treeprocessor
+
+    class SafeLinks(Treeprocessor):
+        def run(self, root):
+            for element in root.iter():
+                for attr in ('href', 'src'):
+                    url = element.get(attr)
+                    if url is not None and urlsplit(url.strip()).scheme.lower() not in SAFE_URL_SCHEMES:
+                        del element.attrib[attr]
+
+    class SanitizeExtension(Extension):
+        def extendMarkdown(self, md):
+            md.preprocessors.deregister('html_block')
+            md.inlinePatterns.deregister('html')
+            md.treeprocessors.register(SafeLinks(md), 'safe_links', 15)
+
+    return markdown.Markdown(extensions=MARKDOWN_EXTENSIONS + [SanitizeExtension()])
+
+_markdown_local = threading.local()
+
+def render_markdown(text):
+    """Render AI-generated markdown to sanitized HTML"""
+    md = getattr(_markdown_local, 'md', None)
+    if md is None:
+        # Markdown instances aren't thread-safe, so keep one per thread
+        md = _markdown_local.md = _new_markdown()
+    with span('render_markdown', chars=len(text or '')):
+        return md.reset().convert(text or '')
+
 def allowed_file(filename):
     """Check if the file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def ai_analyze_file(filepath):
-    """Upload and analyze file with Gemini API"""
-    if not client:
-        return "API client not initialized. Cannot proceed."
+def is_archive(filename):
+    """Check if the file is a zip of syllabi"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ARCHIVE_EXTENSIONS
 
-    uploaded_file = None
-    file_ext = filepath.lower().rsplit('.', 1)[-1]
-    config = {"temperature": 0.0}
+def new_upload_path(filename):
+    """
+    Reserve a unique path for an uploaded file.
 
-    try:
-        # Handle DOCX files by extracting text
-        if file_ext in ['docx', 'doc']:
-            print(f"\n[1/3] Extracting text from DOCX: {os.path.basename(filepath)}...")
-            doc = Document(filepath)
-            text_content = '\n'.join([p.text for p in doc.paragraphs])
-            print("[2/3] Text extracted successfully.")
-            
-            print("[3/3] Requesting analysis from gemini-2.5-flash...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=["Give me a concise summary of this syllabus (start immediately with the summary, no preamble):\n\n" + text_content],
-                config=config
-            )
-            summary = response.text
-            print("[3/3] Summary received.")
-        
-        # Handle PDF and TXT files by uploading
-        else:
-            print(f"\n[1/4] Uploading file: {os.path.basename(filepath)}...")
-            uploaded_file = client.files.upload(file=filepath)
-            print(f"[2/4] File uploaded. URI: {uploaded_file.uri}")
-
-            print("[3/4] Requesting analysis from gemini-2.5-flash...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=["Give me a concise summary of this syllabus (start immediately with the summary, no preamble).", uploaded_file],
-                config=config
-            )
-            
-            summary = response.text
-            print("[4/4] Summary received.")
-        
-        return summary
+    Files get an opaque random ID (so concurrent uploads never collide, even
+    with the same name) and are spread over 256 subdirectories keyed by the
+    ID's first byte, so no single directory grows with the number of
+    pending uploads. The original extension is kept for type detection.
 
-    except FileNotFoundError:
-        return f"Error: File not found at path: {filepath}"
-    except Exception as e:
-        return f"An unexpected error occurred: {e}"
-    finally:
-        # Clean up uploaded file resource
-        if uploaded_file:
-            print(f"\n[CLEANUP] Deleting uploaded file: {uploaded_file.name}")
-            try:
-                client.files.delete(name=uploaded_file.name)
-                print("[CLEANUP] File deleted.")
-            except Exception as e:
-                print(f"[CLEANUP] Failed to delete: {e}")
+    Args:
+        filename (str): Original filename of the upload
+    Returns:
+        str: Absolute path to save the upload to
+    """
+    upload_id = secrets.token_hex(16)
+    ext = filename.rsplit('.', 1)[1].lower()
+    shard = os.path.join(UPLOAD_FOLDER, upload_id[:2])
+    os.makedirs(shard, exist_ok=True)
+    return os.path.join(shard, f"{upload_id}.{ext}")
+
+# --- Text Extraction ---
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def _get_extract_pool():
+    """Process pool for PDF/TXT extraction, started on first use"""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # Spawned, not forked: forking a process with running threads can
+            # copy locks held by other threads and deadlock the child
+            _extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _extract_pool
 
-def ai_validate_syllabus(filepath):
-    """Check if uploaded file is a syllabus using Gemini API"""
-    if not client:
-        return False, "API client not initialized."
+def shutdown_extract_pool():
+    """
+    Stop the extraction processes. Normal interpreter exit does this on its
+    own; multiprocessing children exit without it and need to call this.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(cancel_futures=True)
+            _extract_pool = None
 
-    uploaded_file = None
-    file_ext = filepath.lower().rsplit('.', 1)[-1]
+def extract_local_text(filepath, ext):
+    """
+    Extract a PDF/TXT syllabus's text in the extraction process pool.
 
+    Returns:
+        str: The normalized text ('' if there is none, e.g. a scanned PDF),
+        or None if extraction failed
+    """
+    global _extract_pool
     try:
-        # Handle DOCX files by extracting text
-        if file_ext in ['docx', 'doc']:
-            print(f"\n[VALIDATION] Extracting text from DOCX: {os.path.basename(filepath)}...")
-            doc = Document(filepath)
-            text_content = '\n'.join([p.text for p in doc.paragraphs])[:2000]  # Only first 2000 chars
-            
-            print("[VALIDATION] Checking if document is a syllabus...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[f"Is this a course syllabus or curriculum document? Answer only 'yes' or 'no':\n\n{text_content}"]
-            )
-            answer = response.text.strip().lower()
-        
-        # Handle PDF and TXT files by uploading
+        # Daemonic processes (e.g. multiprocessing workers) can't start a pool
+        if EXTRACT_WORKERS <= 0 or multiprocessing.current_process().daemon:
+            return extract_text(filepath, ext)
+        future = _get_extract_pool().submit(extract_text, filepath, ext)
+        return future.result(timeout=EXTRACT_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        print(f"[EXTRACT] Timed out after {EXTRACT_TIMEOUT:.0f}s on {os.path.basename(filepath)}, uploading instead.")
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool next time
+        with _extract_pool_lock:
+            _extract_pool = None
+        print(f"[EXTRACT] Extraction process died on {os.path.basename(filepath)}, uploading instead.")
+    except Exception as e:
+        print(f"[EXTRACT] Could not extract text from {os.path.basename(filepath)} ({e}), uploading instead.")
+    return None
+
+def _iter_docx_lines(doc):
+    """Yield the lines of a DOCX body in document order, including table rows"""
+    from docx.table import Table
+
+    for block in doc.iter_inner_content():
+        if isinstance(block, Table):
+            for row in block.rows:
+                cells = []
+                for cell in row.cells:
+                    text = ' '.join(cell.text.split())
+                    # Merged cells repeat the same text across the span
+                    if text and (not cells or cells[-1] != text):
+                        cells.append(text)
+                if cells:
+                    yield ' | '.join(cells)
         else:
-            print(f"\n[VALIDATION] Uploading file: {os.path.basename(filepath)}...")
-            uploaded_file = client.files.upload(file=filepath)
-            
-            print("[VALIDATION] Checking if document is a syllabus...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=["Is this a course syllabus or curriculum document? Answer only 'yes' or 'no'.", uploaded_file]
-            )
-            answer = response.text.strip().lower()
-        
-        is_valid = 'yes' in answer
-        print(f"[VALIDATION] Result: {'Valid syllabus' if is_valid else 'Not a syllabus'}")
-        return is_valid, "Valid syllabus" if is_valid else "This does not appear to be a syllabus"
+            yield block.text
 
-    except Exception as e:
-        print(f"[VALIDATION] Error: {e}")
-        return False, f"Validation error: {e}"
-    finally:
-        if uploaded_file:
-            try:
-                client.files.delete(name=uploaded_file.name)
-            except:
-                pass
+def extract_docx_text(filepath):
+    """
+    Extract normalized text (paragraphs and tables) from a DOCX file.
 
-def ai_generate_resources(filepath):
-    """Generate learning resources based on syllabus content"""
-    if not client:
-        print("[ERROR] API client not initialized. Cannot proceed.")
-        return "API client not initialized. Cannot proceed."
-    uploaded_file = None
-    file_ext = filepath.lower().rsplit('.', 1)[-1]
-    config = {"temperature": 0.0}
+    Runs of spaces are collapsed and blank lines squeezed to one.
+    """
+    # python-docx is imported on first use; most requests never need it
+    from docx import Document
 
-    try:
-        print(f"\n[START] Generating resources for: {os.path.basename(filepath)}")
+    lines = []
+    for line in _iter_docx_lines(Document(filepath)):
+        line = ' '.join(line.split())
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return '\n'.join(lines).strip()
+
+class DocumentClosedError(Exception):
+    """A SyllabusDocument was used after it was closed (by an AI call that timed out)"""
+
+class SyllabusDocument:
+    """
+    Per-document processing context shared by all AI helpers.
+
+    The syllabus text is extracted locally at most once and sent with the
+    prompts, cut to a token budget. Only a PDF/TXT without usable text (a
+    scanned PDF, or one extraction failed on) is uploaded to Gemini, at most
+    once, and deleted when the context is closed.
+
+    AI pool calls run through run_call(). One that outlives the document (it
+    timed out) can't start over, upload or extract after close(), and the
+    uploaded file is only deleted once it has finished.
+    """
+
+    def __init__(self, filepath, file_hash=None):
+        """
+        Args:
+            filepath (str): Path of the syllabus on disk
+            file_hash (str, optional): SHA-256 of the file, if already known
+        """
+        self.filepath = filepath
+        self._file_hash = file_hash
+        self.file_ext = filepath.lower().rsplit('.', 1)[-1]
+        self.uploaded_file = None
+        self.text_content = None
+        self._text_extracted = False
+        self._lock = threading.Lock()
+        # Guards closed and the count of run_call() calls still running
+        self._calls = threading.Condition()
+        self.closed = False
+        self._in_flight = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def file_hash(self):
+        """SHA-256 of the syllabus bytes, used as the result cache key"""
+        if self._file_hash is None:
+            sha = hashlib.sha256()
+            with open(self.filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            self._file_hash = sha.hexdigest()
+        return self._file_hash
+
+    @property
+    def is_docx(self):
+        return self.file_ext in ['docx', 'doc']
+
+    def text(self):
+        """
+        Normalized text of the syllabus, or None for a PDF/TXT with no usable
+        text (read from the uploaded file instead).
+
+        Extracted at most once per file content: DOCX with python-docx here,
+        PDF/TXT in the extraction process pool. The result is memoized on the
+        document and stored in the syllabus cache under the file hash (empty
+        for no text), so later jobs for the same bytes skip the parse entirely.
+        """
+        with self._lock:
+            if self._text_extracted:
+                return self.text_content
+            self._check_open()
+            with span('extract_text', format=self.file_ext, cache='miss') as s:
+                cached = cache_get(self.file_hash(), 'text')
+                if cached is not None:
+                    s.set(cache='hit')
+                    text = cached.decode('utf-8')
+                elif self.is_docx:
+                    text = extract_docx_text(self.filepath)
+                    cache_put(self.file_hash(), 'text', text.encode('utf-8'))
+                else:
+                    text = extract_local_text(self.filepath, self.file_ext)
+                    # Failures aren't cached, so the next job tries again
+                    if text is not None:
+                        cache_put(self.file_hash(), 'text', text.encode('utf-8'))
+                if not text and not self.is_docx:
+                    text = None
+                s.set(chars=len(text) if text else 0, tokens=estimate_tokens(text) if text else 0)
+            self.text_content = text
+            self._text_extracted = True
+            return self.text_content
+
+    def prompt_text(self, budget=PROMPT_TOKEN_BUDGET):
+        """
+        Syllabus text to send with a prompt, cut to `budget` estimated tokens,
+        or None if the file has to be uploaded instead.
+        """
+        text = self.text()
+        return truncate_to_tokens(text, budget) if text is not None else None
+
+    def prepare(self):
+        """Run the local extraction stage up front, before the prompts fan out"""
+        self.text()
+
+    def local_text(self, limit):
+        """Up to `limit` characters of locally extracted text, or None"""
+        text = self.text()
+        return text[:limit] if text is not None else None
+
+    def file(self):
+        """Gemini file handle of a PDF/TXT syllabus (uploaded on first use)"""
+        with self._lock:
+            if self.uploaded_file is None:
+                self._check_open()
+                with span('gemini_upload', bytes=os.path.getsize(self.filepath)):
+                    self.uploaded_file = get_client().files.upload(file=self.filepath)
+            return self.uploaded_file
+
+    def _check_open(self):
+        if self.closed:
+            raise DocumentClosedError(f"{os.path.basename(self.filepath)} is closed")
+
+    def run_call(self, call, *args):
+        """
+        Run call(*args) for this document, on an AI pool thread.
 
-        # Prepare prompt template with explicit markdown formatting request
-        prompt_intro = """Using the information in the syllabus I will send,
+        Raises DocumentClosedError instead of starting once the document is
+        closed. The last call to finish after close() deletes the upload.
+        """
+        with self._calls:
+            self._check_open()
+            self._in_flight += 1
+        try:
+            return call(*args)
+        finally:
+            with self._calls:
+                self._in_flight -= 1
+                last = self.closed and self._in_flight == 0
+            if last:
+                self._delete_upload()
+
+    def close(self):
+        """
+        Close the document and delete the uploaded file resource, if any, now
+        or (while timed-out calls are still running) when the last one ends.
+        """
+        with self._calls:
+            self.closed = True
+            if self._in_flight:
+                print(f"[CLEANUP] {self._in_flight} call(s) still running on {os.path.basename(self.filepath)}; "
+                      f"the upload is deleted when they finish")
+                return
+        self._delete_upload()
+
+    def _delete_upload(self):
+        if self.uploaded_file is None:
+            return
+        try:
+            with span('gemini_delete'):
+                get_client().files.delete(name=self.uploaded_file.name)
+        except Exception as e:
+            print(f"[CLEANUP] Failed to delete {getattr(self.uploaded_file, 'name', 'unknown')}: {e}")
+        self.uploaded_file = None
+
+@contextmanager
+def _open_document(source):
+    """Yield a SyllabusDocument for a path, or the given document unchanged"""
+    if isinstance(source, SyllabusDocument):
+        yield source
+    else:
+        with SyllabusDocument(source) as document:
+            yield document
+
+def _generate_text(stage, contents, config=None, on_text=None):
+    """
+    Call Gemini and return the response text, timed as a span of the given
+    stage with the call's token counts.
+
+    With on_text, the response is streamed and on_text(chunk) is called for
+    every piece of text as it arrives.
+    """
+    with span(stage, model=AI_MODEL, cache='miss') as s:
+        if on_text is None:
+            response = get_client().models.generate_content(model=AI_MODEL, contents=contents, config=config)
+            record_usage(s, getattr(response, 'usage_metadata', None))
+            return response.text
+
+        parts = []
+        usage = None
+        started = time.perf_counter()
+        for chunk in get_client().models.generate_content_stream(model=AI_MODEL, contents=contents, config=config):
+            # The final chunk carries the usage totals for the whole response
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            if chunk.text:
+                if not parts:
+                    s.set(first_chunk_seconds=round(time.perf_counter() - started, 3))
+                parts.append(chunk.text)
+                on_text(chunk.text)
+        record_usage(s, usage)
+        return ''.join(parts)
+
+def _generate_summary(document, on_text=None):
+    """Request a syllabus summary from Gemini (raises on failure)"""
+    prompt = "Give me a concise summary of this syllabus (start immediately with the summary, no preamble)"
+    text = document.prompt_text()
+    if text is not None:
+        contents = [prompt + ":\n\n" + text]
+    else:
+        contents = [prompt + ".", document.file()]
+
+    return _generate_text('summary', contents, {"temperature": 0.0}, on_text)
+
+def _check_syllabus(document):
+    """Ask Gemini whether the document is a syllabus (raises on failure)"""
+    prompt = "Is this a course syllabus or curriculum document? Answer only 'yes' or 'no'"
+    text_content = document.prompt_text(VALIDATION_TOKEN_BUDGET)  # Only the beginning
+    if text_content is not None:
+        contents = [f"{prompt}:\n\n{text_content}"]
+    else:
+        contents = [prompt + ".", document.file()]
+
+    return 'yes' in _generate_text('validation', contents).strip().lower()
+
+def _syllabus_contents(document, prompt_intro):
+    """Build generate_content contents for a prompt about the whole syllabus"""
+    text_for_prompt = document.prompt_text()
+    if text_for_prompt is not None:
+        return [prompt_intro + "\n\nSyllabus content:\n" + text_for_prompt]
+    return [
+        prompt_intro + "\n\nRefer to the uploaded file for the syllabus content.",
+        document.file()
+    ]
+
+def _generate_resources(document, on_text=None):
+    """Request a markdown list of learning resources from Gemini (raises on failure)"""
+    # Prepare prompt template with explicit markdown formatting request
+    prompt_intro = """Using the information in the syllabus I will send,
             generate a markdown-formatted list of:
             - Course resources (with authors)
             - Course instructors
@@ -260,154 +1510,276 @@ def ai_generate_resources(filepath):
             (start immediately with the markdown list, no preamble)
         """
 
-        # Handle DOCX files by extracting text
-        if file_ext in ['docx', 'doc']:
-            print("[1/3] Extracting text from DOCX...")
-            doc = Document(filepath)
-            text_content = '\n'.join([p.text for p in doc.paragraphs])
-            print("[2/3] Text extracted successfully. Preparing prompt...")
-            text_for_prompt = text_content[:15000]
-            contents = [prompt_intro + "\n\nSyllabus content:\n" + text_for_prompt]
-
-            print("[3/3] Requesting resources from gemini-2.5-flash...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=contents,
-                config=config
-            )
-            result_text = response.text
-            print("[DONE] Resources received for DOCX.")
+    resources = _generate_text('resources', _syllabus_contents(document, prompt_intro), {"temperature": 0.0}, on_text)
+    return resources.strip()
 
-        # Handle PDF and TXT files by uploading
-        else:
-            print("[1/4] Uploading file...")
-            uploaded_file = client.files.upload(file=filepath)
-            print(f"[2/4] File uploaded. URI: {getattr(uploaded_file, 'uri', 'unknown')}")
+def _extract_schedule(document):
+    """
+    Request the course schedule from Gemini as structured JSON (raises on failure).
 
-            contents = [
-                prompt_intro + "\n\nRefer to the uploaded file for the syllabus content.",
-                uploaded_file
-            ]
+    Returns:
+        str: Normalized schedule JSON (see schedule.parse_schedule)
+    """
+    prompt_intro = """Analyze this syllabus and extract its schedule:
+- Weekly class meetings (days of the week, start and end time, location)
+- Important deadlines (assignments, exams, projects) with their calendar date,
+  or with their semester week number (and weekday) if no date is given
+- Office hours (days of the week, start and end time, location)
 
-            print("[3/4] Requesting resources from gemini-2.5-flash...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=contents,
-                config=config
-            )
-            result_text = response.text
-            print("[4/4] Resources received for uploaded file.")
+Use 24-hour HH:MM times and YYYY-MM-DD dates. Only include items stated in the syllabus.
+"""
+
+    text = _generate_text('schedule', _syllabus_contents(document, prompt_intro), {
+        "temperature": 0.0,
+        "response_mime_type": "application/json",
+        "response_schema": SCHEDULE_SCHEMA
+    })
+    schedule = parse_schedule(text)
+    print(f"[SCHEDULE] {len(schedule['meetings'])} meeting(s), {len(schedule['deadlines'])} deadline(s), "
+          f"{len(schedule['office_hours'])} office hour slot(s).")
+    return json.dumps(schedule)
+
+def ai_analyze_file(source):
+    """Analyze a syllabus (path or SyllabusDocument) with Gemini API"""
+    if not _client_ready():
+        return "API client not initialized. Cannot proceed."
+
+    try:
+        with _open_document(source) as document:
+            return _generate_summary(document)
+    except FileNotFoundError:
+        return f"Error: File not found at path: {getattr(source, 'filepath', source)}"
+    except Exception as e:
+        return f"An unexpected error occurred: {e}"
+
+def _keyword_pattern(keywords):
+    return re.compile(r'(?<!\w)(?:' + '|'.join(re.escape(keyword) for keyword in keywords) + r')(?!\w)')
+
+_SYLLABUS_KEYWORDS_RE = _keyword_pattern(SYLLABUS_KEYWORDS)
+_NON_SYLLABUS_KEYWORDS_RE = _keyword_pattern(NON_SYLLABUS_KEYWORDS)
+
+def syllabus_keyword_hits(text):
+    """
+    Distinct syllabus and non-syllabus (resumes, invoices, letters...)
+    keywords found in a text, as whole words.
+
+    Returns:
+        tuple: (positive hits, negative hits)
+    """
+    text = text.lower()
+    return len(set(_SYLLABUS_KEYWORDS_RE.findall(text))), len(set(_NON_SYLLABUS_KEYWORDS_RE.findall(text)))
+
+def syllabus_score(text):
+    """Heuristic syllabus score of a text: positive minus negative keyword hits"""
+    positive, negative = syllabus_keyword_hits(text)
+    return positive - negative
+
+def _prefilter_syllabus(document):
+    """
+    Decide obvious cases locally.
+
+    Returns:
+        bool: True/False for a confident local verdict, None if ambiguous
+    """
+    text = document.local_text(PREFILTER_BYTES)
+    if not text or not text.strip():
+        return None
+    positive, negative = syllabus_keyword_hits(text)
+    score = positive - negative
+    if score >= PREFILTER_ACCEPT_SCORE:
+        verdict = True
+    elif score <= PREFILTER_REJECT_SCORE and positive == 0:
+        verdict = False
+    else:
+        print(f"[VALIDATION] Pre-filter score {score} is ambiguous, asking the LLM.")
+        return None
+    record_validation('local_accept' if verdict else 'local_reject')
+    print(f"[VALIDATION] Pre-filter score {score}, skipped LLM.")
+    return verdict
+
+def ai_validate_syllabus(source):
+    """
+    Check if a syllabus (path or SyllabusDocument) is a syllabus, locally or with Gemini API.
 
-        return result_text.strip()
+    Returns:
+        tuple: (True/False, message), or (None, message) if the check itself failed
+    """
+    try:
+        with _open_document(source) as document:
+            cached = cache_get(document.file_hash(), 'validation')
+            if cached is not None:
+                is_valid = cached == b'yes'
+                print(f"[VALIDATION] Cache hit: {'Valid syllabus' if is_valid else 'Not a syllabus'}")
+            else:
+                is_valid = _prefilter_syllabus(document)
+                if is_valid is None:
+                    if not _client_ready():
+                        return None, "API client not initialized."
+                    record_validation('llm')
+                    is_valid = _check_syllabus(document)
+                    cache_put(document.file_hash(), 'validation', b'yes' if is_valid else b'no')
+
+        print(f"[VALIDATION] Result: {'Valid syllabus' if is_valid else 'Not a syllabus'}")
+        return is_valid, "Valid syllabus" if is_valid else "This does not appear to be a syllabus"
+
+    except Exception as e:
+        print(f"[VALIDATION] Error: {e}")
+        if isinstance(e, AIUnavailableError) or is_retryable(e):
+            return None, "The AI service is busy or unavailable"
+        return None, f"Validation error: {e}"
 
+def ai_generate_resources(source):
+    """Generate learning resources based on syllabus content"""
+    if not _client_ready():
+        print("[ERROR] API client not initialized. Cannot proceed.")
+        return "API client not initialized. Cannot proceed."
+
+    try:
+        with _open_document(source) as document:
+            return _generate_resources(document)
     except FileNotFoundError:
+        filepath = getattr(source, 'filepath', source)
         print(f"[ERROR] File not found at path: {filepath}")
         return f"Error: File not found at path: {filepath}"
     except Exception as e:
         print(f"[ERROR] An unexpected error occurred: {e}")
         return f"An unexpected error occurred: {e}"
-    finally:
-        if uploaded_file:
-            print(f"\n[CLEANUP] Deleting uploaded file: {getattr(uploaded_file, 'name', 'unknown')}")
-            try:
-                client.files.delete(name=uploaded_file.name)
-                print("[CLEANUP] File deleted.")
-            except Exception as e:
-                print(f"[CLEANUP] Failed to delete: {e}")
 
-def ai_generate_ics(filepath, course_name, semester_start_date=None, semester_end_date=None):
+def ai_generate_ics(source, course_name, semester_start_date=None, semester_end_date=None):
     """Generate ICS calendar file based on syllabus content"""
-    if not client:
+    if not _client_ready():
         print("[ERROR] API client not initialized. Cannot proceed.")
         return None
-    
-    uploaded_file = None
-    file_ext = filepath.lower().rsplit('.', 1)[-1]
-    config = {"temperature": 0.0}
+    if not (semester_start_date and semester_end_date):
+        print("[ERROR] Semester dates are required to build a calendar.")
+        return None
 
     try:
-        print(f"\n[START] Generating ICS calendar for: {os.path.basename(filepath)}")
-
-        # Prepare prompt for extracting schedule information
-        prompt_intro = f"""Analyze this syllabus and extract the weekly schedule/course timeline.
-        
-Course Name: {course_name}
-Semester Start: {semester_start_date or 'Not specified'}
-Semester End: {semester_end_date or 'Not specified'}
-
-Generate an ICS (iCalendar) format file with:
-- Weekly class meetings (if schedule is mentioned)
-- Important deadlines (assignments, exams, projects)
-- Office hours (if mentioned)
-
-Format your response ONLY as valid ICS file content. Start with BEGIN:VCALENDAR and end with END:VCALENDAR.
-Use VEVENT for each event. Include DTSTART, DTEND, SUMMARY, DESCRIPTION, and LOCATION when available.
-For recurring weekly classes, use RRULE with FREQ=WEEKLY.
-Use proper ICS date format (YYYYMMDDTHHMMSS).
-
-Start immediately with the ICS content, no preamble or explanation.
-"""
+        with _open_document(source) as document:
+            schedule = json.loads(_extract_schedule(document))
+        return build_ics(schedule, course_name, semester_start_date, semester_end_date)
+    except Exception as e:
+        print(f"[ERROR] An unexpected error occurred during ICS generation: {e}")
+        return None
 
-        # Handle DOCX files by extracting text
-        if file_ext in ['docx', 'doc']:
-            print("[1/3] Extracting text from DOCX...")
-            doc = Document(filepath)
-            text_content = '\n'.join([p.text for p in doc.paragraphs])
-            print("[2/3] Text extracted successfully. Preparing prompt...")
-            text_for_prompt = text_content[:15000]
-            contents = [prompt_intro + "\n\nSyllabus content:\n" + text_for_prompt]
-
-            print("[3/3] Requesting ICS generation from gemini-2.5-flash...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=contents,
-                config=config
-            )
-            ics_content = response.text
-            print("[DONE] ICS content received for DOCX.")
+class _CallStart:
+    """When an AI pool call started running (wait() blocks until it has)"""
 
-        # Handle PDF and TXT files by uploading
-        else:
-            print("[1/4] Uploading file...")
-            uploaded_file = client.files.upload(file=filepath)
-            print(f"[2/4] File uploaded. URI: {getattr(uploaded_file, 'uri', 'unknown')}")
+    def __init__(self):
+        self.started_at = None
+        self._event = threading.Event()
 
-            contents = [
-                prompt_intro + "\n\nRefer to the uploaded file for the syllabus content.",
-                uploaded_file
-            ]
+    def run(self, call, *args):
+        self.started_at = time.monotonic()
+        self._event.set()
+        return call(*args)
 
-            print("[3/4] Requesting ICS generation from gemini-2.5-flash...")
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=contents,
-                config=config
-            )
-            ics_content = response.text
-            print("[4/4] ICS content received for uploaded file.")
-
-        # Clean up markdown code blocks if present
-        ics_content = ics_content.strip()
-        if ics_content.startswith('```'):
-            lines = ics_content.split('\n')
-            ics_content = '\n'.join(lines[1:-1]) if len(lines) > 2 else ics_content
-        
-        # Validate basic ICS structure
-        if 'BEGIN:VCALENDAR' in ics_content and 'END:VCALENDAR' in ics_content:
-            print("[VALIDATION] ICS content appears valid.")
-            return ics_content.encode('utf-8')
+    def wait(self, timeout=None):
+        """Start time of the call, or None if it hasn't started within `timeout`"""
+        self._event.wait(timeout)
+        return self.started_at
+
+def _stream_to(document, on_text, kind, chunk):
+    """Pass a streamed chunk on, or stop a call that timed out (document closed)"""
+    if document.closed:
+        raise DocumentClosedError(f"{kind} finished after the document was closed")
+    on_text(kind, chunk)
+
+def ai_process_syllabus(document, course_name, semester_start_date=None, semester_end_date=None, timeout=None,
+                        on_text=None, queue_timeout=None):
+    """
+    Produce summary, resources and calendar for a syllabus, serving repeats from the cache.
+
+    Anything already in the result cache for this document's content hash is
+    returned without an API call. The remaining prompts are independent, so
+    they run concurrently on the shared AI pool and wall-clock time is roughly
+    that of the slowest call. Each call's timeout starts when it starts
+    running, not while it waits for a pool thread; one still waiting after
+    queue_timeout is cancelled and counts as timed out. A call that fails or
+    exceeds the timeout does not sink the others; its slot is None, the
+    reason is in 'errors', and nothing is cached for it. Error text never
+    stands in for generated content. A timed-out call keeps running until it
+    notices the document is closed (its next streamed chunk, upload or
+    extraction); its late result is dropped.
+
+    The calendar is built locally from the extracted schedule, so the
+    schedule is cached by file hash alone and new semester dates never need
+    another LLM call. The schedule is extracted even when no dates are given.
+
+    Args:
+        document (SyllabusDocument): The syllabus being processed
+        course_name (str): Name/title of the course
+        semester_start_date (str, optional): Start date of semester (YYYY-MM-DD)
+        semester_end_date (str, optional): End date of semester (YYYY-MM-DD)
+        timeout (float, optional): Per-call timeout in seconds (defaults to AI_CALL_TIMEOUT)
+        queue_timeout (float, optional): Longest wait for a pool thread in seconds
+                                         (defaults to AI_QUEUE_TIMEOUT)
+        on_text (callable, optional): Stream summary and resources; called as
+                                      on_text(kind, chunk) from the AI pool threads
+
+    Returns:
+        dict: 'summary', 'resources', 'schedule' (JSON) and 'ics' (None without
+              semester dates or a schedule); failed kinds are None and listed
+              in 'errors' ({kind: user-visible message})
+    """
+    timeout = AI_CALL_TIMEOUT if timeout is None else timeout
+    queue_timeout = AI_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+    file_hash = document.file_hash()
+
+    # kind -> (generator, generator args)
+    jobs = {
+        'summary': (_generate_summary, (document, on_text and partial(_stream_to, document, on_text, 'summary'))),
+        'resources': (_generate_resources, (document, on_text and partial(_stream_to, document, on_text, 'resources')))
+    }
+    # The schedule is extracted even without dates; it is stored with the
+    # result so a calendar can be built once dates are set
+    jobs['schedule'] = (_extract_schedule, (document,))
+
+    results = {kind: None for kind in jobs}
+    results['ics'] = None
+    results['errors'] = {}
+    futures = {}
+    started = {}
+    for kind, (generate, args) in jobs.items():
+        cached = cache_get(file_hash, kind)
+        if cached is not None:
+            with span(kind, cache='hit'):
+                results[kind] = cached.decode('utf-8')
+        elif not _client_ready():
+            results['errors'][kind] = "API client not initialized. Cannot proceed."
         else:
-            print("[WARNING] Generated content may not be valid ICS format.")
-            return ics_content.encode('utf-8')
+            started[kind] = _CallStart()
+            futures[kind] = ai_executor.submit(started[kind].run, document.run_call, generate, *args)
 
-    except Exception as e:
-        print(f"[ERROR] An unexpected error occurred during ICS generation: {e}")
-        return None
-    finally:
-        if uploaded_file:
-            print(f"\n[CLEANUP] Deleting uploaded file: {getattr(uploaded_file, 'name', 'unknown')}")
-            try:
-                client.files.delete(name=uploaded_file.name)
-                print("[CLEANUP] File deleted.")
-            except Exception as e:
-                print(f"[CLEANUP] Failed to delete: {e}")
+    queue_deadline = time.monotonic() + queue_timeout
+    for kind, future in futures.items():
+        try:
+            # Time queued behind other jobs' calls doesn't count, up to the queue deadline
+            if started[kind].wait(max(0, queue_deadline - time.monotonic())) is None and future.cancel():
+                print(f"[ERROR] {kind} generation waited {queue_timeout:.0f}s for a free AI worker")
+                results['errors'][kind] = f"Timed out generating {kind}. Please try again."
+                continue
+            # Not cancelled: it started meanwhile
+            started_at = started[kind].wait()
+            value = future.result(timeout=max(0, started_at + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            print(f"[ERROR] {kind} generation timed out after {timeout:.0f}s")
+            results['errors'][kind] = f"Timed out generating {kind}. Please try again."
+            continue
+        except Exception as e:
+            print(f"[ERROR] {kind} generation failed: {e}")
+            if isinstance(e, AIUnavailableError) or is_retryable(e):
+                results['errors'][kind] = "The AI service is busy or unavailable. Please try again in a few minutes."
+            else:
+                results['errors'][kind] = f"An unexpected error occurred: {e}"
+            continue
+        results[kind] = value
+        cache_put(file_hash, kind, value.encode('utf-8'))
+
+    if results['schedule'] and semester_start_date and semester_end_date:
+        with span('build_ics'):
+            results['ics'] = build_ics(json.loads(results['schedule']), course_name,
+                                       semester_start_date, semester_end_date)
+    elif results['schedule']:
+        print("Skipping ICS generation - semester dates not provided")
+    return results
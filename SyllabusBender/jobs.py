@@ -0,0 +1,419 @@
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+from metrics import observe, span
+from helpers import (
+    SyllabusDocument, ai_validate_syllabus, ai_process_syllabus, add_syllabus_result, add_syllabus_results,
+    compress_legacy_results, index_unindexed_results, query_db, execute_db, transaction
+)
+
+# --- Configuration ---
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Running jobs not updated for this long are assumed lost (e.g. worker crashed) and requeued
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+# Streaming: how often partial text is written to / read from the job row,
+# and how long one /jobs/<id>/stream connection stays open before the page
+# falls back to polling
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.5"))
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "0.3"))
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "120"))
+STREAM_KINDS = ('summary', 'resources')
+
+# Pause between batches of the background migrations (storage format, search index)
+STORAGE_MIGRATION_PAUSE = float(os.getenv("STORAGE_MIGRATION_PAUSE", "1"))
+
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+# --- Job Queue ---
+def enqueue_job(user_id, filepath, course_name, semester_start_date=None, semester_end_date=None,
+                file_hash=None):
+    """
+    Queue an uploaded syllabus for background processing.
+
+    Args:
+        user_id (int): The ID of the user
+        filepath (str): Path of the uploaded syllabus on disk
+        course_name (str): Name/title of the course
+        semester_start_date (str, optional): Start date of semester (YYYY-MM-DD)
+        semester_end_date (str, optional): End date of semester (YYYY-MM-DD)
+        file_hash (str, optional): SHA-256 of the file, computed during upload
+
+    Returns:
+        int: The ID of the queued job
+    """
+    now = time.time()
+    job_id = execute_db(
+        '''INSERT INTO jobs
+           (user_id, status, filepath, file_hash, course_name, semester_start_date, semester_end_date,
+            created_at, updated_at)
+           VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)''',
+        [user_id, filepath, file_hash, course_name, semester_start_date, semester_end_date, now, now]
+    )
+    print(f"[JOBS] Queued job {job_id}")
+    _wakeup.set()
+    return job_id
+
+def enqueue_batch(user_id, files, semester_start_date=None, semester_end_date=None):
+    """
+    Queue several uploaded syllabi as one batch, in a single transaction.
+
+    The files are processed by the same workers as single uploads (at most
+    JOB_WORKERS at a time, sharing the process's Gemini rate limit), and
+    their results are saved together once the last one finishes.
+
+    Args:
+        user_id (int): The ID of the user
+        files (list): (course_name, filepath, file_hash) per syllabus
+        semester_start_date (str, optional): Start date of semester (YYYY-MM-DD)
+        semester_end_date (str, optional): End date of semester (YYYY-MM-DD)
+
+    Returns:
+        int: The ID of the batch
+    """
+    now = time.time()
+    with transaction() as db:
+        batch_id = db.execute(
+            "INSERT INTO batches (user_id, status, created_at, updated_at) VALUES (?, 'processing', ?, ?)",
+            [user_id, now, now]
+        ).lastrowid
+        db.executemany(
+            '''INSERT INTO jobs
+               (user_id, batch_id, status, filepath, file_hash, course_name, semester_start_date,
+                semester_end_date, created_at, updated_at)
+               VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?, ?)''',
+            [[user_id, batch_id, filepath, file_hash, course_name, semester_start_date, semester_end_date, now, now]
+             for course_name, filepath, file_hash in files]
+        )
+    print(f"[JOBS] Queued batch {batch_id} with {len(files)} job(s)")
+    _wakeup.set()
+    return batch_id
+
+def get_batch(batch_id, user_id):
+    """
+    Return a user's batch as a dict with its jobs (id, course_name, status,
+    result_id, error) under 'jobs', or None if it doesn't exist.
+    """
+    batch = query_db('SELECT * FROM batches WHERE id = ? AND user_id = ?', [batch_id, user_id], one=True)
+    if not batch:
+        return None
+    batch = dict(batch)
+    batch['jobs'] = [dict(row) for row in query_db(
+        'SELECT id, course_name, status, result_id, error FROM jobs WHERE batch_id = ? ORDER BY id', [batch_id]
+    )]
+    return batch
+
+def get_job(job_id, user_id):
+    """Return a user's job as a dict, or None if it doesn't exist"""
+    row = query_db('SELECT * FROM jobs WHERE id = ? AND user_id = ?', [job_id, user_id], one=True)
+    return dict(row) if row else None
+
+def _claim_job():
+    """Atomically mark the oldest queued (or stale running) job as running and return it"""
+    now = time.time()
+    with transaction() as db:
+        row = db.execute(
+            '''UPDATE jobs SET status = 'running', updated_at = ?, partial_summary = NULL, partial_resources = NULL
+               WHERE id = (
+                 SELECT id FROM jobs
+                 WHERE status = 'queued' OR (status = 'running' AND updated_at < ?)
+                 ORDER BY id LIMIT 1
+               )
+               RETURNING *''',
+            [now, now - JOB_STALE_SECONDS]
+        ).fetchone()
+    return dict(row) if row else None
+
+def _finish_job(job_id, status, result_id=None, error=None):
+    execute_db(
+        '''UPDATE jobs SET status = ?, result_id = ?, error = ?, updated_at = ?,
+                            partial_summary = NULL, partial_resources = NULL
+           WHERE id = ?''',
+        [status, result_id, error, time.time(), job_id]
+    )
+    print(f"[JOBS] Job {job_id} {status}")
+
+def _settle_batch_job(job, generated=None, error=None):
+    """
+    Record the outcome of a job that belongs to a batch.
+
+    A successful analysis is parked in staged_result ('analyzed'). Whichever
+    job settles last, with nothing left queued or running, saves every
+    parked result with one executemany and marks the batch done, all in the
+    same transaction as its own update. If saving them fails, the batch and
+    its analyzed jobs are marked failed instead.
+    """
+    staged = None
+    if generated is not None:
+        staged = json.dumps({
+            'summary': generated['summary'],
+            'resources': generated['resources'],
+            'schedule': generated['schedule'],
+            'ics': generated['ics'].decode('utf-8') if generated['ics'] else None
+        })
+    batch_id = job['batch_id']
+    now = time.time()
+    with transaction() as db:
+        db.execute(
+            '''UPDATE jobs SET status = ?, staged_result = ?, error = ?, updated_at = ?,
+                                partial_summary = NULL, partial_resources = NULL
+               WHERE id = ?''',
+            ['failed' if error else 'analyzed', staged, error, now, job['id']]
+        )
+        pending = db.execute(
+            "SELECT 1 FROM jobs WHERE batch_id = ? AND status IN ('queued', 'running') LIMIT 1", [batch_id]
+        ).fetchone()
+        if pending:
+            print(f"[JOBS] Job {job['id']} {'failed' if error else 'analyzed'} (batch {batch_id})")
+            return
+
+        analyzed = db.execute(
+            '''SELECT id, user_id, course_name, semester_start_date, semester_end_date, staged_result
+               FROM jobs WHERE batch_id = ? AND status = 'analyzed' ORDER BY id''',
+            [batch_id]
+        ).fetchall()
+        results = []
+        for row in analyzed:
+            staged_result = json.loads(row['staged_result'])
+            results.append({
+                'user_id': row['user_id'],
+                'name': row['course_name'],
+                'semester_start_date': row['semester_start_date'],
+                'semester_end_date': row['semester_end_date'],
+                **staged_result
+            })
+        try:
+            # A savepoint inside this transaction, so nothing half-saved stays behind
+            with span('save_batch', results=len(results)):
+                result_ids = add_syllabus_results(results) if results else []
+        except Exception as e:
+            # The uploaded files are gone by now, so the jobs can't be retried
+            print(f"[JOBS] Batch {batch_id} failed: could not save the results: {e}")
+            db.execute(
+                '''UPDATE jobs SET status = 'failed', staged_result = NULL, error = ?, updated_at = ?
+                   WHERE batch_id = ? AND status = 'analyzed' ''',
+                [f"Could not save the analysis: {e}. Please try again.", now, batch_id]
+            )
+            db.execute("UPDATE batches SET status = 'failed', updated_at = ? WHERE id = ?", [now, batch_id])
+            return
+        db.executemany(
+            "UPDATE jobs SET status = 'done', result_id = ?, staged_result = NULL, updated_at = ? WHERE id = ?",
+            [[result_id, now, row['id']] for result_id, row in zip(result_ids, analyzed)]
+        )
+        db.execute("UPDATE batches SET status = 'done', updated_at = ? WHERE id = ?", [now, batch_id])
+    print(f"[JOBS] Batch {batch_id} done: {len(result_ids)} result(s) saved")
+
+def _fail_job(job, error):
+    if job['batch_id']:
+        _settle_batch_job(job, error=error)
+    else:
+        _finish_job(job['id'], 'failed', error=error)
+
+class _ProgressWriter:
+    """
+    on_text callback for ai_process_syllabus that writes the text streamed so
+    far to the job row, at most every STREAM_FLUSH_INTERVAL per kind. Going
+    through the database lets any web process serve the job's stream.
+    """
+
+    def __init__(self, app, job_id):
+        self.app = app
+        self.job_id = job_id
+        self.text = {kind: '' for kind in STREAM_KINDS}
+        self.flushed_at = {kind: 0.0 for kind in STREAM_KINDS}
+        self.lock = threading.Lock()
+
+    def __call__(self, kind, chunk):
+        with self.lock:
+            self.text[kind] += chunk
+            now = time.monotonic()
+            if now - self.flushed_at[kind] < STREAM_FLUSH_INTERVAL:
+                return
+            self.flushed_at[kind] = now
+            text = self.text[kind]
+        # Called from AI pool threads, which have no app context of their own
+        with self.app.app_context():
+            execute_db(
+                f'UPDATE jobs SET partial_{kind} = ?, updated_at = ? WHERE id = ? AND status = \'running\'',
+                [text, time.time(), self.job_id]
+            )
+
+def process_job(job):
+    """Validate and analyze a claimed job's syllabus, then store the result"""
+    filepath = job['filepath']
+    try:
+        with SyllabusDocument(filepath, file_hash=job['file_hash']) as document:
+            # Extract the text once, before the prompts fan out to the AI pool
+            document.prepare()
+            with span('validate') as s:
+                is_valid, message = ai_validate_syllabus(document)
+                s.set(valid=is_valid)
+            if is_valid is None:
+                _fail_job(job, f"Could not check the file: {message}. Please try again.")
+                return
+            if not is_valid:
+                _fail_job(job, f"Invalid file: {message}. Please upload a course syllabus.")
+                return
+
+            with span('analyze'):
+                generated = ai_process_syllabus(
+                    document, job['course_name'], job['semester_start_date'], job['semester_end_date'],
+                    on_text=_ProgressWriter(current_app._get_current_object(), job['id'])
+                )
+
+        # Without a summary or resources there is nothing worth saving; what did
+        # succeed is cached, so trying again later is cheap. A missing schedule
+        # only means no calendar.
+        failed = [generated['errors'][kind] for kind in ('summary', 'resources') if kind in generated['errors']]
+        if failed:
+            _fail_job(job, failed[0])
+            return
+
+        if job['batch_id']:
+            # Saved together with the rest of the batch
+            _settle_batch_job(job, generated)
+            return
+
+        # The result (calendar included) and the job's completion commit together
+        with span('save_result'), transaction():
+            result_id = add_syllabus_result(
+                user_id=job['user_id'],
+                name=job['course_name'],
+                summary=generated['summary'],
+                resources=generated['resources'],
+                semester_start_date=job['semester_start_date'],
+                semester_end_date=job['semester_end_date'],
+                schedule=generated['schedule'],
+                ics=generated['ics']
+            )
+            if result_id:
+                _finish_job(job['id'], 'done', result_id=result_id)
+            else:
+                _finish_job(job['id'], 'failed', error="Could not save the analysis. Please try again.")
+    except Exception as e:
+        print(f"[JOBS] Job {job['id']} crashed: {e}")
+        _fail_job(job, f"An unexpected error occurred: {e}")
+    finally:
+        # Clean up the file once processing is over
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        except OSError:
+            pass
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_job_events(job_id, user_id):
+    """
+    Server-Sent Events for a job: 'summary'/'resources' events carry newly
+    streamed text ({"text": ..., "reset": bool}), followed by a final 'done'
+    or 'failed' event, or 'timeout' after STREAM_MAX_SECONDS.
+    """
+    sent = {kind: 0 for kind in STREAM_KINDS}
+    deadline = time.monotonic() + STREAM_MAX_SECONDS
+    while time.monotonic() < deadline:
+        job = get_job(job_id, user_id)
+        if job is None:
+            yield _sse('failed', {'error': "Job not found"})
+            return
+        if job['status'] in ('done', 'failed'):
+            # Partial text is cleared on completion; the result page has the final text
+            yield _sse(job['status'], {'result_id': job['result_id'], 'error': job['error']})
+            return
+        for kind in STREAM_KINDS:
+            text = job[f'partial_{kind}'] or ''
+            # A requeued job starts streaming from scratch
+            reset = len(text) < sent[kind]
+            if reset:
+                sent[kind] = 0
+            if len(text) > sent[kind] or reset:
+                yield _sse(kind, {'text': text[sent[kind]:], 'reset': reset})
+                sent[kind] = len(text)
+        time.sleep(STREAM_POLL_INTERVAL)
+    yield _sse('timeout', {})
+
+def process_next_job(app):
+    """
+    Claim and process one job.
+
+    Returns:
+        bool: True if a job was processed, False if the queue was empty
+    """
+    with app.app_context():
+        job = _claim_job()
+        if job is None:
+            return False
+        observe('queue_wait', time.time() - job['created_at'])
+        with span('job', job_id=job['id']):
+            process_job(job)
+        return True
+
+def _worker_loop(app):
+    while True:
+        try:
+            if process_next_job(app):
+                continue
+        except Exception as e:
+            print(f"[JOBS] Worker error: {e}")
+        # Woken early by enqueue_job; the timeout picks up jobs queued by other processes
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+def _storage_migration_loop(app):
+    """
+    Bring rows written by older versions up to date, a batch at a time,
+    then exit: convert results to the current storage format, then add
+    results saved before the search index existed to it.
+    """
+    total = 0
+    while True:
+        try:
+            with app.app_context():
+                converted = compress_legacy_results()
+        except Exception as e:
+            print(f"[STORAGE] Migration error: {e}")
+            return
+        if not converted:
+            break
+        total += converted
+        # Leave the write lock to requests and job workers between batches
+        time.sleep(STORAGE_MIGRATION_PAUSE)
+    if total:
+        print(f"[STORAGE] Converted {total} result(s) to the current storage format.")
+
+    total = 0
+    after_id = 0
+    while True:
+        try:
+            with app.app_context():
+                indexed, after_id = index_unindexed_results(after_id)
+        except Exception as e:
+            print(f"[SEARCH] Indexing error: {e}")
+            return
+        if not indexed:
+            break
+        total += indexed
+        time.sleep(STORAGE_MIGRATION_PAUSE)
+    if total:
+        print(f"[SEARCH] Indexed {total} earlier result(s).")
+
+def start_workers(app, count=JOB_WORKERS):
+    """Start the background worker threads for this process (once; called on every request)"""
+    if _workers:
+        return
+    with _workers_lock:
+        if _workers:
+            return
+        for i in range(count):
+            worker = threading.Thread(target=_worker_loop, args=(app,), name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+        print(f"[JOBS] Started {count} worker(s).")
+        threading.Thread(target=_storage_migration_loop, args=(app,), name="storage-migration", daemon=True).start()
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+
+# --- Configuration ---
+# METRICS_ENABLED collects the histograms served by /metrics; SPAN_LOG prints
+# one structured line per finished span that took at least
+# SPAN_LOG_MIN_SECONDS (or failed). With both off, span() returns a shared
+# no-op object.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+SPAN_LOG = os.getenv("SPAN_LOG", "1") == "1"
+SPAN_LOG_MIN_SECONDS = float(os.getenv("SPAN_LOG_MIN_SECONDS", "0.01"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+def _label_text(labelnames, key):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Prometheus counter with labels"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            yield f'{self.name}{{{_label_text(self.labelnames, key)}}} {_number(value)}'
+
+class Histogram:
+    """Prometheus histogram with labels and fixed buckets"""
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        # key -> [bucket counts..., sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            items = sorted((key, list(state)) for key, state in self.values.items())
+        for key, state in items:
+            labels = _label_text(self.labelnames, key)
+            prefix = f'{labels},' if labels else ''
+            for bound, count in zip(self.buckets, state):
+                yield f'{self.name}_bucket{{{prefix}le="{_number(bound)}"}} {count}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {state[-1]}'
+            yield f'{self.name}_sum{{{labels}}} {_number(state[-2])}'
+            yield f'{self.name}_count{{{labels}}} {state[-1]}'
+
+# --- Metrics ---
+stage_seconds = Histogram(
+    'syllabus_stage_seconds', 'Time spent in each processing stage.', LATENCY_BUCKETS, ('stage',)
+)
+ai_tokens = Histogram(
+    'syllabus_ai_tokens', 'Tokens per Gemini call.', TOKEN_BUCKETS, ('stage', 'direction')
+)
+cache_requests = Counter(
+    'syllabus_cache_requests_total', 'Result cache lookups by kind and outcome.', ('kind', 'result')
+)
+stage_errors = Counter(
+    'syllabus_stage_errors_total', 'Stages that ended with an exception.', ('stage', 'error')
+)
+validation_decisions = Counter(
+    'syllabus_validation_decisions_total',
+    'Syllabus checks by who decided: local_accept, local_reject (pre-filter) or llm.', ('decision',)
+)
+http_seconds = Histogram(
+    'syllabus_http_request_seconds', 'Time to produce HTTP responses (not counting streamed bodies).',
+    LATENCY_BUCKETS, ('endpoint', 'method', 'status')
+)
+ALL_METRICS = (stage_seconds, ai_tokens, cache_requests, stage_errors, validation_decisions, http_seconds)
+
+# --- Spans ---
+class Span:
+    """
+    Times a block of work. Extra fields (token counts, cache hit/miss, ...)
+    can be added with set() while it runs; input_tokens/output_tokens feed
+    the token histogram.
+    """
+
+    __slots__ = ('stage', 'fields', 'started')
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self.started = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        if METRICS_ENABLED:
+            stage_seconds.observe(seconds, stage=self.stage)
+            for direction in ('input', 'output'):
+                tokens = self.fields.get(f'{direction}_tokens')
+                if tokens is not None:
+                    ai_tokens.observe(tokens, stage=self.stage, direction=direction)
+            if exc_type is not None:
+                stage_errors.inc(stage=self.stage, error=exc_type.__name__)
+        if SPAN_LOG and (seconds >= SPAN_LOG_MIN_SECONDS or exc_type is not None):
+            details = ''.join(f' {key}={value}' for key, value in self.fields.items() if value is not None)
+            print(f"[SPAN] stage={self.stage} seconds={seconds:.3f}{details}")
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(stage, **fields):
+    """
+    Context manager timing one stage, e.g.
+
+        with span('summary', cache='miss') as s:
+            ...
+            s.set(input_tokens=1200, output_tokens=300)
+    """
+    if not (METRICS_ENABLED or SPAN_LOG):
+        return _NOOP_SPAN
+    return Span(stage, fields)
+
+def record_usage(current_span, usage):
+    """Copy token counts from a Gemini usage_metadata object onto a span"""
+    if usage is None:
+        return
+    current_span.set(
+        input_tokens=getattr(usage, 'prompt_token_count', None),
+        output_tokens=getattr(usage, 'candidates_token_count', None)
+    )
+
+def record_cache(kind, hit):
+    """Count a result cache lookup"""
+    if METRICS_ENABLED:
+        cache_requests.inc(kind=kind, result='hit' if hit else 'miss')
+
+def record_validation(decision):
+    """Count a syllabus check by who decided it ('local_accept', 'local_reject' or 'llm')"""
+    if METRICS_ENABLED:
+        validation_decisions.inc(decision=decision)
+
+def observe(stage, seconds):
+    """Record a duration measured elsewhere (e.g. time a job spent queued)"""
+    if METRICS_ENABLED:
+        stage_seconds.observe(seconds, stage=stage)
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.lines())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,48 @@
+CREATE TABLE IF NOT EXISTS users (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  username TEXT NOT NULL UNIQUE,
+  hash TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS results (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  name TEXT,
+  summary TEXT,
+  resources TEXT,
+  ics BLOB,
+  semester_start_date DATE,
+  semester_end_date DATE,
+  current_date DATE,
+  FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS syllabus_cache (
+  file_hash TEXT NOT NULL,
+  version TEXT NOT NULL,
+  kind TEXT NOT NULL,
+  params TEXT NOT NULL DEFAULT '',
+  value BLOB,
+  size INTEGER NOT NULL,
+  last_used REAL NOT NULL,
+  PRIMARY KEY (file_hash, version, kind, params)
+);
+
+CREATE INDEX IF NOT EXISTS idx_syllabus_cache_last_used ON syllabus_cache (last_used);
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  status TEXT NOT NULL,
+  filepath TEXT NOT NULL,
+  course_name TEXT,
+  semester_start_date DATE,
+  semester_end_date DATE,
+  result_id INTEGER,
+  error TEXT,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL,
+  FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
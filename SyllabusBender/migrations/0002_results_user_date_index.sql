@@ -0,0 +1,3 @@
+-- Every user-scoped results query filters on user_id and orders by
+-- "current_date" (quoted: unquoted CURRENT_DATE is SQLite's date keyword).
+CREATE INDEX IF NOT EXISTS idx_results_user_date ON results (user_id, "current_date");
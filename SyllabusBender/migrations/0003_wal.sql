@@ -0,0 +1,5 @@
+-- no-transaction
+-- Write-ahead logging lets readers proceed while a writer commits. The
+-- journal mode is stored in the database file, so this only runs once;
+-- synchronous/cache_size are per-connection and are set in get_db().
+PRAGMA journal_mode = WAL;
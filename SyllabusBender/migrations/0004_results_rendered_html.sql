@@ -0,0 +1,4 @@
+-- Resources markdown rendered to sanitized HTML at save time, tagged with
+-- the renderer version that produced it (see RENDERER_VERSION in helpers.py).
+ALTER TABLE results ADD COLUMN resources_html TEXT;
+ALTER TABLE results ADD COLUMN html_version INTEGER;
@@ -0,0 +1,3 @@
+-- Text streamed so far for a running job, read by the /jobs/<id>/stream endpoint.
+ALTER TABLE jobs ADD COLUMN partial_summary TEXT;
+ALTER TABLE jobs ADD COLUMN partial_resources TEXT;
@@ -0,0 +1,2 @@
+-- SHA-256 computed while the upload streamed in; the result cache key.
+ALTER TABLE jobs ADD COLUMN file_hash TEXT;
@@ -0,0 +1,8 @@
+-- Server-side sessions for the 'sqlite' SESSION_BACKEND (see sessions.py).
+CREATE TABLE IF NOT EXISTS sessions (
+  id TEXT PRIMARY KEY,
+  data BLOB NOT NULL,
+  expiry REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expiry);
@@ -0,0 +1,4 @@
+-- Structured schedule extracted from the syllabus (JSON, see schedule.py).
+-- Kept per result so the calendar can be rebuilt for new semester dates
+-- without the original file or another LLM call.
+ALTER TABLE results ADD COLUMN schedule TEXT;
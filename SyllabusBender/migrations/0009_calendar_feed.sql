@@ -0,0 +1,19 @@
+-- Secret token in each user's calendar subscription URL (calendar apps
+-- poll the feed without the session cookie). Created on first use.
+ALTER TABLE users ADD COLUMN calendar_token TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_calendar_token ON users (calendar_token);
+
+-- Unix time a result's calendar last changed; the feed's Last-Modified/ETag.
+-- Kept up to date by triggers so every writer bumps it.
+ALTER TABLE results ADD COLUMN updated_at REAL;
+UPDATE results SET updated_at = (julianday('now') - 2440587.5) * 86400.0;
+
+CREATE TRIGGER IF NOT EXISTS results_touch_insert AFTER INSERT ON results
+BEGIN
+  UPDATE results SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS results_touch_update AFTER UPDATE OF name, ics ON results
+BEGIN
+  UPDATE results SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = NEW.id;
+END;
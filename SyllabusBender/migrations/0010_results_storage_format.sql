@@ -0,0 +1,14 @@
+-- How summary, resources, resources_html and ics are stored:
+-- 0 = plain text/bytes (legacy rows), 1 = gzip (see RESULT_STORAGE_FORMAT).
+-- Legacy rows are converted in the background by the job workers.
+ALTER TABLE results ADD COLUMN storage_format INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_results_legacy_storage ON results (id) WHERE storage_format = 0;
+
+-- Converting a row's storage format doesn't change its calendar, so it
+-- mustn't move the feed's Last-Modified/ETag
+DROP TRIGGER IF EXISTS results_touch_update;
+CREATE TRIGGER results_touch_update AFTER UPDATE OF name, ics ON results
+WHEN NEW.storage_format IS OLD.storage_format
+BEGIN
+  UPDATE results SET updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = NEW.id;
+END;
@@ -0,0 +1,16 @@
+-- Several syllabi uploaded together (multiple files or a zip). Each file is
+-- still its own job; a batch job that finishes analysis parks its output in
+-- staged_result ('analyzed') until the whole batch is done, and the last
+-- one saves every result in a single transaction.
+CREATE TABLE IF NOT EXISTS batches (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  status TEXT NOT NULL,
+  created_at REAL NOT NULL,
+  updated_at REAL NOT NULL,
+  FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+ALTER TABLE jobs ADD COLUMN batch_id INTEGER REFERENCES batches (id);
+ALTER TABLE jobs ADD COLUMN staged_result TEXT;
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id, status) WHERE batch_id IS NOT NULL;
@@ -0,0 +1,22 @@
+-- Full-text index of saved classes for /search (rowid = results.id).
+-- owner holds 'u<user_id>' so a query only walks the postings of one user.
+-- summary, resources and ics are stored gzip-compressed, which SQL can't
+-- read, so the text columns are written by the application in the same
+-- transaction as the result (see index_results in helpers.py); rows saved
+-- before this migration are indexed in the background by the job workers.
+-- The triggers below keep renames and deletions in sync.
+CREATE VIRTUAL TABLE IF NOT EXISTS results_search USING fts5(
+  owner, name, summary, resources, events,
+  tokenize = 'porter unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS results_search_rename AFTER UPDATE OF name ON results
+BEGIN
+  UPDATE results_search SET name = NEW.name WHERE rowid = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS results_search_delete AFTER DELETE ON results
+BEGIN
+  DELETE FROM results_search WHERE rowid = OLD.id;
+END;
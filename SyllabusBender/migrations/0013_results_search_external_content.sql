@@ -0,0 +1,54 @@
+-- The search index no longer keeps its own uncompressed copy of every
+-- class's text: it is an external content table over results_search_source,
+-- a view that unpacks the stored fields with the result_text and
+-- result_events functions the app registers on its connections (see
+-- _connect in helpers.py). Snippets are built from that view, so only the
+-- rows of the hits shown are decompressed.
+--
+-- Rows saved before this migration are indexed again in the background by
+-- the job workers. results_search_docsize has one row per indexed result,
+-- which is what tells indexed and not-yet-indexed results apart (selecting
+-- from results_search itself reads the view). Writing to results outside
+-- the app (e.g. the sqlite3 shell) fails on the triggers below, since the
+-- functions aren't registered there.
+DROP TRIGGER IF EXISTS results_search_rename;
+DROP TRIGGER IF EXISTS results_search_delete;
+DROP TABLE IF EXISTS results_search;
+
+CREATE VIEW IF NOT EXISTS results_search_source AS
+SELECT id, 'u' || user_id AS owner, name,
+       result_text(summary, storage_format) AS summary,
+       result_text(resources, storage_format) AS resources,
+       result_events(ics, storage_format) AS events
+FROM results;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS results_search USING fts5(
+  owner, name, summary, resources, events,
+  content = 'results_search_source',
+  content_rowid = 'id',
+  tokenize = 'porter unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+-- FTS5 removes a row's postings by reading its current text from the view,
+-- so the old row is taken out before a change and the new one added after.
+-- Converting a row's storage format doesn't change its text.
+CREATE TRIGGER IF NOT EXISTS results_search_before_update BEFORE UPDATE OF name, ics ON results
+WHEN NEW.storage_format IS OLD.storage_format
+ AND EXISTS (SELECT 1 FROM results_search_docsize WHERE id = OLD.id)
+BEGIN
+  DELETE FROM results_search WHERE rowid = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS results_search_after_update AFTER UPDATE OF name, ics ON results
+WHEN NEW.storage_format IS OLD.storage_format
+BEGIN
+  INSERT INTO results_search (rowid, owner, name, summary, resources, events)
+  SELECT id, owner, name, summary, resources, events FROM results_search_source WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS results_search_delete BEFORE DELETE ON results
+WHEN EXISTS (SELECT 1 FROM results_search_docsize WHERE id = OLD.id)
+BEGIN
+  DELETE FROM results_search WHERE rowid = OLD.id;
+END;
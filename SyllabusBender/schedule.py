@@ -0,0 +1,345 @@
+import hashlib
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
+
+# --- Configuration ---
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+_TIME_RE = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+# Response schema for Gemini structured output (OpenAPI subset used by the genai SDK)
+_RECURRING_ITEM = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "days": {"type": "ARRAY", "items": {"type": "STRING", "enum": WEEKDAYS}},
+        "start_time": {"type": "STRING", "description": "24-hour HH:MM"},
+        "end_time": {"type": "STRING", "description": "24-hour HH:MM"},
+        "location": {"type": "STRING"},
+        "description": {"type": "STRING"}
+    },
+    "required": ["days", "start_time", "end_time"]
+}
+SCHEDULE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "meetings": {"type": "ARRAY", "items": _RECURRING_ITEM},
+        "office_hours": {"type": "ARRAY", "items": _RECURRING_ITEM},
+        "deadlines": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "title": {"type": "STRING"},
+                    "date": {"type": "STRING", "description": "YYYY-MM-DD, if a calendar date is given"},
+                    "week": {"type": "INTEGER", "description": "Week of the semester (1-based), if no date is given"},
+                    "weekday": {"type": "STRING", "enum": WEEKDAYS},
+                    "time": {"type": "STRING", "description": "24-hour HH:MM, if given"},
+                    "description": {"type": "STRING"}
+                },
+                "required": ["title"]
+            }
+        }
+    },
+    "required": ["meetings", "office_hours", "deadlines"]
+}
+
+# --- Schedule Parsing ---
+def _clean_time(value):
+    match = _TIME_RE.match((value or '').strip())
+    return f"{int(match.group(1)):02d}:{match.group(2)}" if match else None
+
+def _clean_text(value):
+    return ' '.join(str(value).split()) if value else ''
+
+def _clean_recurring(item, default_title):
+    days = [d for d in WEEKDAYS if d in {str(x).upper() for x in item.get('days') or []}]
+    start, end = _clean_time(item.get('start_time')), _clean_time(item.get('end_time'))
+    if not days or not start or not end or end <= start:
+        return None
+    return {
+        'title': _clean_text(item.get('title')) or default_title,
+        'days': days,
+        'start_time': start,
+        'end_time': end,
+        'location': _clean_text(item.get('location')),
+        'description': _clean_text(item.get('description'))
+    }
+
+def _clean_deadline(item):
+    title = _clean_text(item.get('title'))
+    if not title:
+        return None
+    deadline = {'title': title, 'time': _clean_time(item.get('time')),
+                'description': _clean_text(item.get('description'))}
+    try:
+        deadline['date'] = date.fromisoformat(str(item['date']).strip()).isoformat()
+    except (KeyError, TypeError, ValueError):
+        week = item.get('week')
+        if not isinstance(week, int) or week < 1:
+            return None
+        deadline['week'] = week
+        weekday = str(item.get('weekday') or '').upper()
+        deadline['weekday'] = weekday if weekday in WEEKDAYS else None
+    return deadline
+
+def parse_schedule(text):
+    """
+    Parse and normalize a schedule extracted by Gemini.
+
+    Entries with missing or malformed days, times or dates are dropped, so
+    whatever is returned can always be turned into a valid calendar.
+
+    Args:
+        text (str): JSON matching SCHEDULE_SCHEMA
+    Returns:
+        dict: 'meetings', 'office_hours' and 'deadlines' lists
+    Raises:
+        ValueError: If the text isn't a JSON object
+    """
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Schedule must be a JSON object")
+    schedule = {
+        'meetings': [_clean_recurring(i, 'Class') for i in data.get('meetings') or [] if isinstance(i, dict)],
+        'office_hours': [_clean_recurring(i, 'Office Hours') for i in data.get('office_hours') or []
+                         if isinstance(i, dict)],
+        'deadlines': [_clean_deadline(i) for i in data.get('deadlines') or [] if isinstance(i, dict)]
+    }
+    return {key: [item for item in items if item] for key, items in schedule.items()}
+
+# --- ICS Building ---
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def _fold(line):
+    """Fold a content line to 75 octets as required by RFC 5545"""
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line
+    parts = []
+    while len(raw) > 75:
+        cut = 75 if not parts else 74
+        # Don't split inside a multi-byte UTF-8 sequence
+        while cut > 0 and (raw[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(raw[:cut].decode('utf-8'))
+        raw = raw[cut:]
+    parts.append(raw.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+def _uid(course_name, *parts):
+    digest = hashlib.sha1('|'.join([course_name, *map(str, parts)]).encode('utf-8')).hexdigest()
+    return f"{digest[:24]}@syllabusbender"
+
+def _first_on_or_after(start, days):
+    """First date on or after `start` that falls on one of `days`"""
+    for offset in range(7):
+        day = start + timedelta(days=offset)
+        if WEEKDAYS[day.weekday()] in days:
+            return day
+    return start
+
+def _deadline_date(deadline, semester_start):
+    if deadline.get('date'):
+        return date.fromisoformat(deadline['date'])
+    if semester_start is None:
+        return None
+    week_start = semester_start + timedelta(weeks=deadline['week'] - 1)
+    if deadline.get('weekday'):
+        return _first_on_or_after(week_start, [deadline['weekday']])
+    return week_start
+
+def build_ics(schedule, course_name, semester_start_date, semester_end_date):
+    """
+    Build an iCalendar file from a parsed schedule.
+
+    Weekly meetings and office hours recur from the first matching weekday on
+    or after the semester start until the semester end (RRULE ... UNTIL).
+    Deadlines use their date, or their week number counted from the semester
+    start. The output only depends on the arguments, so the calendar can be
+    rebuilt for new dates at any time without calling the LLM.
+
+    Args:
+        schedule (dict): Result of parse_schedule()
+        course_name (str): Name/title of the course
+        semester_start_date (str): Start date of semester (YYYY-MM-DD)
+        semester_end_date (str): End date of semester (YYYY-MM-DD)
+    Returns:
+        bytes: UTF-8 encoded ICS content
+    """
+    semester_start = date.fromisoformat(semester_start_date)
+    semester_end = date.fromisoformat(semester_end_date)
+    dtstamp = datetime.combine(semester_start, datetime.min.time(), timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    until = f"{semester_end.strftime('%Y%m%d')}T235959"
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Syllabus Bender//Schedule//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(course_name)}'
+    ]
+
+    def event(uid, summary, start, end=None, all_day=False, rrule=None, location='', description=''):
+        lines.extend(['BEGIN:VEVENT', f'UID:{uid}', f'DTSTAMP:{dtstamp}'])
+        if all_day:
+            lines.append(f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}")
+        else:
+            lines.append(f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}")
+            lines.append(f"DTEND:{(end or start).strftime('%Y%m%dT%H%M%S')}")
+        if rrule:
+            lines.append(f'RRULE:{rrule}')
+        lines.append(f'SUMMARY:{_escape(summary)}')
+        if location:
+            lines.append(f'LOCATION:{_escape(location)}')
+        if description:
+            lines.append(f'DESCRIPTION:{_escape(description)}')
+        lines.append('END:VEVENT')
+
+    for kind in ('meetings', 'office_hours'):
+        for index, item in enumerate(schedule.get(kind, [])):
+            first_day = _first_on_or_after(semester_start, item['days'])
+            if first_day > semester_end:
+                continue
+            start = datetime.combine(first_day, datetime.strptime(item['start_time'], '%H:%M').time())
+            end = datetime.combine(first_day, datetime.strptime(item['end_time'], '%H:%M').time())
+            event(
+                _uid(course_name, kind, index, item['title']),
+                f"{course_name}: {item['title']}",
+                start, end,
+                rrule=f"FREQ=WEEKLY;BYDAY={','.join(item['days'])};UNTIL={until}",
+                location=item['location'],
+                description=item['description']
+            )
+
+    for index, deadline in enumerate(schedule.get('deadlines', [])):
+        day = _deadline_date(deadline, semester_start)
+        if day is None:
+            continue
+        if deadline.get('time'):
+            start = datetime.combine(day, datetime.strptime(deadline['time'], '%H:%M').time())
+            event(_uid(course_name, 'deadline', index, deadline['title']),
+                  f"{course_name}: {deadline['title']}", start, start,
+                  description=deadline['description'])
+        else:
+            event(_uid(course_name, 'deadline', index, deadline['title']),
+                  f"{course_name}: {deadline['title']}", day, all_day=True,
+                  description=deadline['description'])
+
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(_fold(line) for line in lines) + '\r\n').encode('utf-8')
+
+# --- Calendar Merging ---
+def _unfold(text):
+    """Content lines of an ICS file, with folded lines joined back together"""
+    lines = []
+    for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    return lines
+
+def _components(lines, name):
+    """Yield each BEGIN:<name> ... END:<name> block (nested components included)"""
+    block = None
+    depth = 0
+    for line in lines:
+        upper = line.upper()
+        if upper == f'BEGIN:{name}':
+            if block is None:
+                block = []
+            depth += 1
+        if block is not None:
+            block.append(line)
+        if upper == f'END:{name}' and block is not None:
+            depth -= 1
+            if depth == 0:
+                yield block
+                block = None
+
+def _property(block, name):
+    for line in block:
+        key, _, value = line.partition(':')
+        if key.split(';', 1)[0].upper() == name:
+            return value
+    return None
+
+def merge_calendars(calendars, calendar_name):
+    """
+    Merge several ICS files into one VCALENDAR.
+
+    VEVENTs are copied unchanged apart from UIDs that clash with an earlier
+    calendar's, which get the result ID appended. Time zone definitions are
+    included once per TZID.
+
+    Args:
+        calendars (list): (result_id, ics bytes) pairs, in a stable order
+        calendar_name (str): Name shown by calendar apps
+    Returns:
+        bytes: UTF-8 encoded ICS content
+    """
+    timezones = {}
+    events = []
+    seen_uids = set()
+    for result_id, ics in calendars:
+        lines = _unfold(ics.decode('utf-8', errors='replace') if isinstance(ics, bytes) else ics)
+        for block in _components(lines, 'VTIMEZONE'):
+            timezones.setdefault(_property(block, 'TZID'), block)
+        for block in _components(lines, 'VEVENT'):
+            uid = _property(block, 'UID')
+            if uid is None or uid in seen_uids:
+                uid = f"{uid or 'event'}-{result_id}"
+                block = [line for line in block if line.partition(':')[0].split(';', 1)[0].upper() != 'UID']
+                block.insert(1, f'UID:{uid}')
+            seen_uids.add(uid)
+            events.append(block)
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Syllabus Bender//Schedule//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(calendar_name)}'
+    ]
+    for block in timezones.values():
+        lines.extend(block)
+    for block in events:
+        lines.extend(block)
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(_fold(line) for line in lines) + '\r\n').encode('utf-8')
+
+# --- Search Text ---
+def _unescape(text):
+    return re.sub(r'\\([\;,nN])', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), text)
+
+def ics_event_text(ics):
+    """
+    Plain text of a calendar's events for the search index: one line per
+    VEVENT with its first date (ISO and "October 14"), summary, location
+    and description.
+
+    Args:
+        ics (bytes | str): ICS content
+    Returns:
+        str: The event text ('' if there are no events)
+    """
+    lines = _unfold(ics.decode('utf-8', errors='replace') if isinstance(ics, bytes) else ics)
+    events = []
+    for block in _components(lines, 'VEVENT'):
+        parts = []
+        start = re.match(r'(\d{4})(\d{2})(\d{2})', _property(block, 'DTSTART') or '')
+        if start:
+            try:
+                day = date(*(int(part) for part in start.groups()))
+                parts.append(f"{day.isoformat()} {day.strftime('%B')} {day.day}")
+            except ValueError:
+                pass
+        for name in ('SUMMARY', 'LOCATION', 'DESCRIPTION'):
+            value = _property(block, name)
+            if value:
+                parts.append(_unescape(value))
+        events.append(' '.join(parts))
+    return '\n'.join(events)
@@ -0,0 +1,144 @@
+import os
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from helpers import get_db
+
+# --- Configuration ---
+# Expired session rows are deleted in batches, at most once per interval per process
+SESSION_CLEANUP_INTERVAL = float(os.getenv("SESSION_CLEANUP_INTERVAL", "300"))
+SESSION_CLEANUP_BATCH = int(os.getenv("SESSION_CLEANUP_BATCH", "1000"))
+
+_serializer = TaggedJSONSerializer()
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+class SqliteSession(CallbackDict, SessionMixin):
+    """Server-side session whose data lives in the sessions table"""
+
+    def __init__(self, initial=None, sid=None, expiry=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expiry = expiry
+        self.modified = False
+        self.regenerate = sid is None
+
+    def clear(self):
+        # A cleared session (login/logout) gets a fresh ID to avoid session fixation
+        super().clear()
+        self.regenerate = True
+
+class SqliteSessionInterface(SessionInterface):
+    """
+    Stores sessions in the app's SQLite database (WAL mode), keyed by a
+    random ID kept in the session cookie.
+
+    A row is only written when the session changed, or when it is past half
+    its lifetime and needs its expiry pushed back, so read-only requests cost
+    a single primary-key lookup. Expired rows are removed in batches.
+    """
+
+    session_class = SqliteSession
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = get_db().execute(
+                'SELECT data, expiry FROM sessions WHERE id = ?', [sid]
+            ).fetchone()
+            if row is not None and row['expiry'] > time.time():
+                return self.session_class(_serializer.loads(row['data']), sid=sid, expiry=row['expiry'])
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+
+        if not session:
+            if session.sid and (session.modified or session.regenerate):
+                self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        stale = session.expiry is not None and session.expiry - now < lifetime / 2
+        if not (session.modified or session.regenerate or stale):
+            return
+
+        db = get_db()
+        if session.regenerate:
+            if session.sid:
+                db.execute('DELETE FROM sessions WHERE id = ?', [session.sid])
+            session.sid = secrets.token_urlsafe(32)
+        db.execute(
+            'INSERT OR REPLACE INTO sessions (id, data, expiry) VALUES (?, ?, ?)',
+            [session.sid, _serializer.dumps(dict(session)), now + lifetime]
+        )
+        db.commit()
+        self._cleanup_expired(now)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def _delete(self, sid):
+        db = get_db()
+        db.execute('DELETE FROM sessions WHERE id = ?', [sid])
+        db.commit()
+
+    def _cleanup_expired(self, now):
+        global _last_cleanup
+        with _cleanup_lock:
+            if now - _last_cleanup < SESSION_CLEANUP_INTERVAL:
+                return
+            _last_cleanup = now
+        db = get_db()
+        cur = db.execute(
+            'DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE expiry < ? LIMIT ?)',
+            [now, SESSION_CLEANUP_BATCH]
+        )
+        db.commit()
+        if cur.rowcount:
+            print(f"[SESSIONS] Removed {cur.rowcount} expired session(s).")
+
+def init_sessions(app, backend):
+    """
+    Install the session backend selected by configuration.
+
+    Args:
+        app (Flask): The application
+        backend (str): 'sqlite' (server-side, in the app database), 'cookie'
+                       (signed cookie; needs SECRET_KEY) or 'filesystem'
+                       (Flask-Session's cachelib directory store)
+    """
+    if backend == "sqlite":
+        app.session_interface = SqliteSessionInterface()
+    elif backend == "cookie":
+        # Flask's default interface: the session is a signed cookie
+        if not app.secret_key:
+            print("Warning: SECRET_KEY is not set; cookie sessions won't survive a restart.")
+            app.secret_key = secrets.token_hex(32)
+    elif backend == "filesystem":
+        from flask_session import Session
+        app.config["SESSION_TYPE"] = "filesystem"
+        Session(app)
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    print(f"Using {backend} sessions.")
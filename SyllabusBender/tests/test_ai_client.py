@@ -0,0 +1,78 @@
+import pytest
+
+import ai_client
+from ai_client import AIUnavailableError, CircuitBreaker, ResilientClient, TokenBucket
+
+class FlakyModels:
+    """generate_content that raises the queued errors in turn, then answers"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+    def generate_content_stream(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        yield 'ok'
+
+class StubClient:
+    def __init__(self, errors=()):
+        self.models = FlakyModels(errors)
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ai_client, 'GEMINI_BACKOFF_BASE', 0)
+
+def half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == 'half-open'
+    return breaker
+
+def resilient(stub, breaker, limiter=None):
+    return ResilientClient(stub, limiter=limiter or TokenBucket(1000, 1000), breaker=breaker, max_retries=2)
+
+def test_trial_call_retried_after_retryable_error_closes_breaker():
+    breaker = half_open_breaker()
+    stub = StubClient([ConnectionError('503 Service Unavailable')])
+
+    assert resilient(stub, breaker).models.generate_content(model='m', contents=['x']) == 'ok'
+    assert stub.models.calls == 2
+    assert breaker.state == 'closed'
+    assert not breaker.trial_running
+
+def test_trial_stream_retried_after_retryable_error_closes_breaker():
+    breaker = half_open_breaker()
+    stub = StubClient([ConnectionError('503 Service Unavailable')])
+
+    assert list(resilient(stub, breaker).models.generate_content_stream(model='m', contents=['x'])) == ['ok']
+    assert breaker.state == 'closed'
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+    breaker.opened_at = 0
+    stub = StubClient([ConnectionError('down')] * 3)
+
+    with pytest.raises(ConnectionError):
+        resilient(stub, breaker).models.generate_content(model='m', contents=['x'])
+    assert breaker.opened_at is not None
+    assert not breaker.trial_running
+
+def test_trial_without_rate_limit_slot_lets_next_trial_through(monkeypatch):
+    monkeypatch.setattr(ai_client, 'GEMINI_RATE_WAIT', 0)
+    breaker = half_open_breaker()
+    empty = TokenBucket(0.001, 1)
+    empty.tokens = 0
+
+    with pytest.raises(AIUnavailableError):
+        resilient(StubClient(), breaker, limiter=empty).models.generate_content(model='m', contents=['x'])
+    assert not breaker.trial_running
+    assert resilient(StubClient(), breaker).models.generate_content(model='m', contents=['x']) == 'ok'
+    assert breaker.state == 'closed'
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import helpers
+from helpers import DocumentClosedError, SyllabusDocument, ai_process_syllabus
+
+class StubFiles:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    helpers.init_db()
+    stub = SimpleNamespace(files=StubFiles())
+    monkeypatch.setattr(helpers, 'client', stub)
+    yield stub
+    helpers.release_db()
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / 'syllabus.txt'
+    path.write_text('Course schedule and grading')
+    return SyllabusDocument(str(path))
+
+def test_timeout_starts_when_the_call_runs(client, document, monkeypatch):
+    # One pool thread: each call waits for the one before it
+    monkeypatch.setattr(helpers, 'ai_executor', ThreadPoolExecutor(max_workers=1))
+    def slow(document, on_text=None):
+        time.sleep(0.2)
+        return 'text'
+    for name in ('_generate_summary', '_generate_resources', '_extract_schedule'):
+        monkeypatch.setattr(helpers, name, slow)
+
+    results = ai_process_syllabus(document, 'Algorithms', timeout=0.35)
+
+    assert results['errors'] == {}
+    assert results['summary'] == results['resources'] == 'text'
+
+def test_late_call_stops_and_upload_outlives_it(client, document, monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+    streamed = []
+    outcome = {}
+    def stuck_summary(document, on_text):
+        on_text('first')
+        release.wait(5)
+        try:
+            on_text('late')
+        except DocumentClosedError as e:
+            outcome['error'] = e
+        finally:
+            finished.set()
+    monkeypatch.setattr(helpers, '_generate_summary', stuck_summary)
+    monkeypatch.setattr(helpers, '_generate_resources', lambda document, on_text: 'resources')
+    monkeypatch.setattr(helpers, '_extract_schedule', lambda document: '[]')
+    document.uploaded_file = SimpleNamespace(name='files/syllabus')
+
+    results = ai_process_syllabus(document, 'Algorithms', timeout=0.1,
+                                  on_text=lambda kind, chunk: streamed.append(chunk))
+    document.close()
+
+    assert 'summary' in results['errors']
+    assert client.files.deleted == []
+    with pytest.raises(DocumentClosedError):
+        document.run_call(document.prepare)
+
+    release.set()
+    assert finished.wait(5)
+    # The delete runs as the late call returns
+    deadline = time.monotonic() + 5
+    while not client.files.deleted and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert isinstance(outcome['error'], DocumentClosedError)
+    assert streamed == ['first']
+    assert client.files.deleted == ['files/syllabus']
+
+def test_call_waiting_too_long_for_the_pool_is_cancelled(client, document, monkeypatch):
+    # The only pool thread is taken by another job's call
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(helpers, 'ai_executor', executor)
+    busy = threading.Event()
+    executor.submit(busy.wait, 5)
+    ran = []
+    def generate(document, on_text=None):
+        ran.append(True)
+        return 'text'
+    for name in ('_generate_summary', '_generate_resources', '_extract_schedule'):
+        monkeypatch.setattr(helpers, name, generate)
+
+    started = time.monotonic()
+    results = ai_process_syllabus(document, 'Algorithms', timeout=5, queue_timeout=0.2)
+
+    assert time.monotonic() - started < 2
+    assert set(results['errors']) == {'summary', 'resources', 'schedule'}
+    assert 'Timed out' in results['errors']['summary']
+    busy.set()
+    executor.shutdown(wait=True)
+    assert ran == []
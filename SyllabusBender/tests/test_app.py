@@ -0,0 +1,25 @@
+import pytest
+
+import app as app_module
+import helpers
+
+@pytest.fixture
+def flask_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    started = []
+    monkeypatch.setattr(app_module, 'start_workers', started.append)
+    flask_app = app_module.create_app({'SECRET_KEY': 'test'})
+    flask_app.started_workers = started
+    yield flask_app
+    helpers.release_db()
+
+def test_cli_commands_do_not_start_workers(flask_app):
+    result = flask_app.test_cli_runner().invoke(args=['invalidate-cache', '--stale-only'])
+
+    assert result.exit_code == 0
+    assert flask_app.started_workers == []
+
+def test_workers_start_with_the_first_request(flask_app):
+    flask_app.test_client().get('/login')
+
+    assert flask_app.started_workers == [flask_app]
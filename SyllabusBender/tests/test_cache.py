@@ -0,0 +1,48 @@
+import pytest
+
+import helpers
+from helpers import cache_get, cache_put, execute_db, query_db
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    helpers.init_db()
+    yield
+    helpers.release_db()
+
+@pytest.fixture
+def statements(database):
+    traced = []
+    helpers.get_db().set_trace_callback(traced.append)
+    yield traced
+    helpers.get_db().set_trace_callback(None)
+
+def writes(statements, verb):
+    return [sql for sql in statements if sql.lstrip().startswith(verb)]
+
+def test_recent_hit_is_not_written_back(statements):
+    cache_put('a' * 64, 'summary', b'summary')
+    statements.clear()
+
+    assert cache_get('a' * 64, 'summary') == b'summary'
+    assert writes(statements, 'UPDATE') == []
+
+def test_stale_hit_refreshes_last_used(statements):
+    cache_put('a' * 64, 'summary', b'summary')
+    execute_db('UPDATE syllabus_cache SET last_used = 0')
+
+    assert cache_get('a' * 64, 'summary') == b'summary'
+    assert query_db('SELECT last_used FROM syllabus_cache', one=True)['last_used'] > 0
+
+def test_eviction_only_runs_over_the_limit(statements, monkeypatch):
+    monkeypatch.setattr(helpers, 'CACHE_MAX_BYTES', 10)
+    cache_put('a' * 64, 'summary', b'12345')
+    cache_put('b' * 64, 'summary', b'12345')
+    assert writes(statements, 'DELETE') == []
+
+    execute_db("UPDATE syllabus_cache SET last_used = 0 WHERE file_hash = ?", ['a' * 64])
+    cache_put('c' * 64, 'summary', b'12345')
+
+    assert len(writes(statements, 'DELETE')) == 1
+    assert cache_get('a' * 64, 'summary') is None
+    assert cache_get('c' * 64, 'summary') == b'12345'
@@ -0,0 +1,43 @@
+import pytest
+
+import helpers
+import jobs
+from helpers import execute_db, query_db
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    helpers.init_db()
+    execute_db("INSERT INTO users (username, hash) VALUES ('student', 'hash')")
+    yield
+    helpers.release_db()
+
+GENERATED = {'summary': 'summary', 'resources': 'resources', 'schedule': None, 'ics': None}
+
+def run_batch(names):
+    batch_id = jobs.enqueue_batch(1, [(name, f'/tmp/{name}.pdf', name) for name in names])
+    execute_db("UPDATE jobs SET status = 'running' WHERE batch_id = ?", [batch_id])
+    for job in query_db('SELECT * FROM jobs WHERE batch_id = ? ORDER BY id', [batch_id]):
+        jobs._settle_batch_job(job, generated=GENERATED)
+    return batch_id
+
+def test_batch_is_saved_when_the_last_job_settles(database):
+    batch_id = run_batch(['Algorithms', 'Databases'])
+
+    assert query_db('SELECT status FROM batches WHERE id = ?', [batch_id], one=True)['status'] == 'done'
+    rows = query_db('SELECT status, result_id FROM jobs WHERE batch_id = ?', [batch_id])
+    assert [row['status'] for row in rows] == ['done', 'done']
+    assert all(row['result_id'] for row in rows)
+
+def test_failed_save_marks_batch_and_jobs_failed(database, monkeypatch):
+    def index_fails(rows):
+        raise RuntimeError('disk I/O error')
+    monkeypatch.setattr(helpers, 'index_results', index_fails)
+
+    batch_id = run_batch(['Algorithms', 'Databases'])
+
+    assert query_db('SELECT status FROM batches WHERE id = ?', [batch_id], one=True)['status'] == 'failed'
+    rows = query_db('SELECT status, staged_result, error FROM jobs WHERE batch_id = ?', [batch_id])
+    assert [row['status'] for row in rows] == ['failed', 'failed']
+    assert all(row['staged_result'] is None and 'disk I/O error' in row['error'] for row in rows)
+    assert query_db('SELECT COUNT(*) FROM results')[0][0] == 0
@@ -0,0 +1,27 @@
+import pytest
+
+import app as app_module
+import helpers
+import metrics
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    flask_app = app_module.create_app({'TESTING': True, 'START_WORKERS': False, 'SECRET_KEY': 'test'})
+    yield flask_app.test_client()
+    helpers.release_db()
+
+def test_metrics_not_served_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', None)
+
+    assert client.get('/metrics').status_code == 404
+
+def test_metrics_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'secret')
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert b'syllabus_validation_decisions_total' in response.data
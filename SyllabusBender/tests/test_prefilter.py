@@ -0,0 +1,38 @@
+import helpers
+import metrics
+
+class TextDocument:
+    """Just enough of a SyllabusDocument for the pre-filter"""
+
+    def __init__(self, text):
+        self.text = text
+
+    def local_text(self, limit):
+        return self.text[:limit]
+
+SHORT_SYLLABUS = """HIST 210 - Modern Europe
+Lecture slides are posted after class. Classes resume after spring break on March 23.
+Questions? Email me any time.
+"""
+
+RESUME = """Curriculum Vitae - Jane Doe
+Career objective: backend engineer.
+Work experience: 2019-2024 Acme Corp. Professional experience in Python.
+Employment history and references available on request.
+"""
+
+def test_keywords_match_whole_words_only():
+    assert helpers.syllabus_keyword_hits("Classes resume after break. Lecture slides. Questions?") == (1, 0)
+    assert helpers.syllabus_keyword_hits("Homeworks and lectureship") == (0, 0)
+
+def test_short_syllabus_with_ambiguous_words_goes_to_llm():
+    assert helpers._prefilter_syllabus(TextDocument(SHORT_SYLLABUS)) is None
+
+def test_clear_non_syllabus_is_rejected_locally():
+    before = metrics.validation_decisions.values.get(('local_reject',), 0)
+    assert helpers._prefilter_syllabus(TextDocument(RESUME)) is False
+    assert metrics.validation_decisions.values.get(('local_reject',), 0) == before + 1
+
+def test_negative_hits_alongside_syllabus_keywords_go_to_llm():
+    text = RESUME + "\nGuest lecture on the course schedule."
+    assert helpers._prefilter_syllabus(TextDocument(text)) is None
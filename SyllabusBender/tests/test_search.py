@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import helpers
+from helpers import (add_syllabus_result, compress_legacy_results, execute_db, index_unindexed_results, query_db,
+                     search_results)
+from schedule import parse_schedule
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    helpers.init_db()
+    execute_db("INSERT INTO users (username, hash) VALUES ('student', 'hash')")
+    yield
+    helpers.release_db()
+
+def integrity_check():
+    execute_db("INSERT INTO results_search (results_search, rank) VALUES ('integrity-check', 1)")
+
+def test_index_keeps_no_copy_of_the_text(database):
+    add_syllabus_result(1, 'Algorithms', 'Graphs, greedy methods and the midterm exam.', '- CLRS')
+
+    tables = {row[0] for row in query_db("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'results_search_content' not in tables
+    hits, has_next = search_results(1, 'midterm')
+    assert [hit['field'] for hit in hits] == ['summary']
+    assert '<mark>midterm</mark>' in hits[0]['snippet_html']
+    assert not has_next
+
+def test_name_only_match_shows_start_of_summary(database):
+    add_syllabus_result(1, 'Algorithms', 'Graphs, greedy methods and dynamic programming.', '- CLRS')
+
+    hits, _ = search_results(1, 'algorithms')
+    assert hits[0]['field'] == 'summary'
+    assert hits[0]['snippet_html'].startswith('Graphs, greedy methods')
+
+def test_rename_and_delete_keep_the_index_in_sync(database):
+    result_id = add_syllabus_result(1, 'Algorithms', 'Graphs and trees.', '- CLRS')
+    other_id = add_syllabus_result(1, 'Databases', 'Joins and trees.', '- Ullman')
+
+    execute_db("UPDATE results SET name = 'Graph Theory' WHERE id = ?", [result_id])
+    assert search_results(1, 'algorithms')[0] == []
+    assert [hit['id'] for hit in search_results(1, 'theory')[0]] == [result_id]
+
+    execute_db('DELETE FROM results WHERE id = ?', [result_id])
+    assert [hit['id'] for hit in search_results(1, 'trees')[0]] == [other_id]
+    integrity_check()
+
+def test_legacy_rows_are_indexed_and_survive_compression(database):
+    execute_db(
+        '''INSERT INTO results (user_id, name, summary, resources, "current_date", storage_format)
+           VALUES (1, 'Biology', 'Cells and genetics.', '- Campbell', '2026-01-01', 0)'''
+    )
+
+    assert index_unindexed_results()[0] == 1
+    assert index_unindexed_results()[0] == 0
+    assert compress_legacy_results() == 1
+    assert len(search_results(1, 'genetics')[0]) == 1
+    integrity_check()
+
+def test_calendar_rebuild_reindexes_events(database):
+    schedule = json.dumps(parse_schedule(
+        '{"meetings": [], "office_hours": [], "deadlines": [{"title": "Project demo", "week": 2}]}'
+    ))
+    add_syllabus_result(1, 'Algorithms', 'Graphs.', '- CLRS', schedule=schedule)
+
+    assert search_results(1, 'demo')[0] == []
+    assert helpers.rebuild_calendars(1, '2026-09-01', '2026-12-15') == (1, 0)
+    hits, _ = search_results(1, 'demo')
+    assert hits[0]['field'] == 'events'
+    assert search_results(1, 'september')[0]
+    integrity_check()
@@ -0,0 +1,34 @@
+import pytest
+
+import helpers
+from helpers import compress_legacy_results, execute_db, get_result_for_view, query_db
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    helpers.init_db()
+    execute_db("INSERT INTO users (username, hash) VALUES ('student', 'hash')")
+    yield
+    helpers.release_db()
+
+def test_legacy_rows_are_found_through_the_partial_index(database):
+    statements = []
+    helpers.get_db().set_trace_callback(statements.append)
+    compress_legacy_results()
+    helpers.get_db().set_trace_callback(None)
+
+    select = next(sql for sql in statements if sql.lstrip().startswith('SELECT id, summary'))
+    plan = query_db('EXPLAIN QUERY PLAN ' + select)
+    assert 'idx_results_legacy_storage' in plan[0]['detail']
+
+def test_legacy_rows_are_converted(database):
+    execute_db(
+        '''INSERT INTO results (user_id, name, summary, resources, "current_date", storage_format)
+           VALUES (1, 'Biology', 'Cells.', '- Campbell', '2026-01-01', 0)'''
+    )
+
+    assert compress_legacy_results() == 1
+    assert compress_legacy_results() == 0
+    row = query_db('SELECT id, storage_format FROM results', one=True)
+    assert row['storage_format'] == helpers.RESULT_STORAGE_FORMAT
+    assert get_result_for_view(row['id'], 1)['summary'] == 'Cells.'
@@ -0,0 +1,44 @@
+import pytest
+
+import helpers
+from helpers import add_syllabus_result, execute_db, query_db, transaction
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    helpers.init_db()
+    execute_db("INSERT INTO users (username, hash) VALUES ('student', 'hash')")
+    yield
+    helpers.release_db()
+
+def count(table):
+    return query_db(f'SELECT COUNT(*) FROM {table}')[0][0]
+
+def test_failed_nested_block_rolls_back_only_its_own_writes(database, monkeypatch):
+    def index_fails(rows):
+        raise RuntimeError('search index unavailable')
+    monkeypatch.setattr(helpers, 'index_results', index_fails)
+
+    with transaction():
+        assert add_syllabus_result(1, 'Algorithms', 'summary', 'resources') is None
+        execute_db("INSERT INTO users (username, hash) VALUES ('other', 'hash')")
+
+    assert count('results') == 0
+    assert count('users') == 2
+
+def test_outer_rollback_undoes_committed_nested_block(database):
+    with pytest.raises(ValueError):
+        with transaction():
+            with transaction():
+                execute_db("INSERT INTO users (username, hash) VALUES ('other', 'hash')")
+            raise ValueError
+
+    assert count('users') == 1
+    assert not helpers.get_db().in_transaction
+
+def test_nested_result_is_saved_and_indexed(database):
+    with transaction():
+        result_id = add_syllabus_result(1, 'Algorithms', 'summary', 'resources')
+
+    assert count('results') == 1
+    assert query_db("SELECT rowid FROM results_search WHERE results_search MATCH 'algorithms'")[0][0] == result_id
@@ -0,0 +1,44 @@
+import io
+import os
+
+import pytest
+
+import app as app_module
+import helpers
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'DATABASE', str(tmp_path / 'database.db'))
+    monkeypatch.setattr(helpers, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    flask_app = app_module.create_app({'TESTING': True, 'START_WORKERS': False, 'SECRET_KEY': 'test'})
+    helpers.execute_db("INSERT INTO users (username, hash) VALUES ('student', 'hash')")
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    yield client
+    helpers.release_db()
+
+def uploaded_files(tmp_path):
+    return [name for _, _, names in os.walk(tmp_path / 'uploads') for name in names]
+
+@pytest.mark.parametrize('second', [
+    ('notes.pdf', b'<html>not a pdf</html>'),
+    ('big.txt', b'x' * 4096),
+])
+def test_rejected_later_file_removes_earlier_uploads(client, tmp_path, monkeypatch, second):
+    monkeypatch.setattr(helpers.UploadStream.__init__, '__defaults__', (1024,))
+    data = {'file': [(io.BytesIO(b'%PDF-1.4 syllabus'), 'syllabus.pdf'), (io.BytesIO(second[1]), second[0])]}
+
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/upload')
+    assert uploaded_files(tmp_path) == []
+
+def test_committed_batch_files_are_kept(client, tmp_path):
+    data = {'file': [(io.BytesIO(b'%PDF-1.4 one'), 'one.pdf'), (io.BytesIO(b'%PDF-1.4 two'), 'two.pdf')]}
+
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+    assert '/batches/' in response.headers['Location']
+    assert len(uploaded_files(tmp_path)) == 2